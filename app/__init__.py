@@ -2,6 +2,9 @@ from flask import Flask
 from flask_restful import Api
 from firebase_admin import credentials, initialize_app
 from dotenv import load_dotenv
+from .services import timed, startup_report
+from .ingestion import IngestionRequest
+import threading
 import os
 
 def create_app():
@@ -12,14 +15,42 @@ def create_app():
     app = Flask(__name__)
     api = Api(app)
 
+    # Uploads are streamed into one bounded buffer per image
+    app.request_class = IngestionRequest
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_REQUEST_BYTES', 64 * 1024 * 1024))
+    app.config['MAX_IMAGE_BYTES'] = int(os.getenv('MAX_IMAGE_BYTES', 10 * 1024 * 1024))
+
     # Initialize Firebase Admin
-    cred = credentials.Certificate(os.getenv('FIREBASE_KEY'))
-    initialize_app(cred)
+    with timed('firebase_admin'):
+        cred = credentials.Certificate(os.getenv('FIREBASE_KEY'))
+        initialize_app(cred)
 
     # Import and register resources
-    from .models import UserModel, PredictionModel, LoginModel
-    api.add_resource(UserModel, '/user')
-    api.add_resource(PredictionModel, '/user/predictions/<string:prediction_id>', '/user/predictions')
-    api.add_resource(LoginModel, '/user/login')
+    with timed('resources'):
+        from .models import UserModel, PredictionModel, PredictionJobModel, RiceFieldClusterModel, LoginModel, \
+            ReadinessModel, warm_up, job_queue
+        api.add_resource(UserModel, '/user')
+        api.add_resource(PredictionModel, '/user/predictions/<string:prediction_id>', '/user/predictions')
+        api.add_resource(PredictionJobModel, '/user/predictions/jobs/<string:job_id>')
+        api.add_resource(RiceFieldClusterModel, '/user/rice_field/clusters')
+        api.add_resource(LoginModel, '/user/login')
+        api.add_resource(ReadinessModel, '/ready')
+
+    # Start the background workers for asynchronous prediction jobs
+    job_queue.start()
+
+    # Load the prediction models in the background while lightweight routes are already served
+    app.config['WARM_UP_ON_START'] = os.getenv('WARM_UP_ON_START', 'true').lower() == 'true'
+    if app.config['WARM_UP_ON_START']:
+        def _warm_up():
+            try:
+                warm_up()
+            except Exception:
+                # /ready keeps answering 503 for the service that failed
+                app.logger.exception('Warm-up of the prediction services failed')
+                return
+            app.logger.info('Startup breakdown (seconds): %s', startup_report)
+
+        threading.Thread(target=_warm_up, name='warm-up', daemon=True).start()
 
     return app
@@ -1,9 +1,16 @@
 import os
 import jwt
+import time
+import threading
 from datetime import datetime, timedelta
+from cachetools import LRUCache
 
 SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 
+# Decoded payloads of already verified tokens, served until their exp without verifying the signature again
+_verified_tokens = LRUCache(maxsize=int(os.getenv('JWT_CACHE_SIZE', 4096)))
+_verified_tokens_lock = threading.Lock()
+
 def generate_token(user_id):
     """
     Generates a JWT token with an expiration time of 24 hours.
@@ -19,8 +26,19 @@ def verify_token(token):
     """
     Verifies a JWT token and returns the decoded payload.
     """
+    with _verified_tokens_lock:
+        payload = _verified_tokens.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        with _verified_tokens_lock:
+            _verified_tokens.pop(token, None)
+        raise ValueError("Token has expired")
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        with _verified_tokens_lock:
+            _verified_tokens[token] = payload
         return payload
     except jwt.ExpiredSignatureError:
         raise ValueError("Token has expired")
@@ -0,0 +1,110 @@
+import threading
+import numpy as np
+from cachetools import LRUCache
+from scipy.spatial import cKDTree
+
+
+class FieldHistory:
+    def __init__(self, max_trees=8):
+        """
+        Leaf points of a rice field's earlier predictions, clustered incrementally in the field's UTM zone.
+
+        The clusters match DBSCAN with min_samples=2: every point with a neighbour within eps is a core point, so the
+        clusters are the connected components of the eps-neighbourhood graph and isolated points are noise. New
+        points are only range-queried against the KD-trees of the earlier batches and merged with a union-find,
+        so appending a prediction does not re-cluster every earlier point.
+
+        Callers hold lock while they read or extend the history.
+
+        Args:
+            max_trees (int): Number of per-batch KD-trees kept before they are merged into one.
+        """
+        self.max_trees = max_trees
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """
+        Forget every point, e.g. after one of the predictions they came from has been deleted.
+        """
+        self.prediction_ids = set()
+        self.coords = np.empty((0, 2))
+        self.points = np.empty((0, 3))
+        self.parents = np.empty(0, dtype=np.intp)
+        self.trees = []
+
+    def __len__(self):
+        return len(self.coords)
+
+    def _find(self, i):
+        root = i
+        while self.parents[root] != root:
+            root = self.parents[root]
+        while self.parents[i] != root:
+            self.parents[i], i = root, self.parents[i]
+        return root
+
+    def _union(self, i, j):
+        root_i, root_j = self._find(i), self._find(j)
+        if root_i != root_j:
+            # The lowest index stays the root so labels follow the order of first appearance, like DBSCAN
+            self.parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    def extend(self, coords, points, eps):
+        """
+        Append new points and return the labels of every point in the history (-1 for noise).
+
+        Args:
+            coords (array): (N, 2) projected coordinates of the new points in meters.
+            points (array): (N, 3) [longitude, latitude, level] rows of the new points.
+            eps (float): Neighbourhood radius in meters.
+        """
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        if len(coords):
+            offset = len(self.coords)
+            self.parents = np.concatenate([self.parents, np.arange(offset, offset + len(coords))])
+
+            new_tree = cKDTree(coords)
+            for tree, tree_offset in self.trees:
+                for i, neighbours in enumerate(new_tree.query_ball_tree(tree, eps)):
+                    for j in neighbours:
+                        self._union(offset + i, tree_offset + j)
+            for i, j in new_tree.query_pairs(eps, output_type='ndarray'):
+                self._union(offset + i, offset + j)
+
+            self.coords = np.vstack([self.coords, coords])
+            self.points = np.vstack([self.points, np.asarray(points, dtype=float).reshape(-1, 3)])
+            self.trees.append((new_tree, offset))
+            if len(self.trees) > self.max_trees:
+                self.trees = [(cKDTree(self.coords), 0)]
+        return self.labels()
+
+    def labels(self):
+        roots = np.array([self._find(i) for i in range(len(self.parents))], dtype=np.intp)
+        _, inverse, counts = np.unique(roots, return_inverse=True, return_counts=True)
+        cluster_numbers = np.cumsum(counts > 1) - 1
+        return np.where(counts[inverse] > 1, cluster_numbers[inverse], -1)
+
+
+class FieldHistoryStore:
+    def __init__(self, maxsize=256):
+        """
+        Per-process field histories keyed by (user_id, rice_field_id), the least recently used dropped first.
+        """
+        self.histories = LRUCache(maxsize=maxsize)
+        self.lock = threading.Lock()
+
+    def get(self, field_key):
+        """
+        Return the history of a rice field, creating an empty one the first time.
+        """
+        with self.lock:
+            history = self.histories.get(field_key)
+            if history is None:
+                history = self.histories[field_key] = FieldHistory()
+            return history
+
+    def invalidate(self, user_id):
+        with self.lock:
+            for field_key in [key for key in self.histories if key[0] == user_id]:
+                del self.histories[field_key]
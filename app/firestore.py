@@ -1,6 +1,14 @@
-from datetime import datetime
+import re
+import json
+import base64
+import hashlib
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 from firebase_admin import firestore
 from google.cloud.firestore import GeoPoint
+from .geometry_codec import encode_polyline, decode_polyline
 
 
 def _get_document(ref, check_deleted=True):
@@ -22,48 +30,208 @@ def _convert_to_geopoints(coordinates):
 
 
 def _serialize_geopoints(geopoints):
+    # Coordinates written with the polyline encoding are stored as one string instead of a GeoPoint array
+    if isinstance(geopoints, str):
+        return decode_polyline(geopoints)
     return [[point.latitude, point.longitude] for point in geopoints]
 
 
-def _serialize_prediction_data(prediction):
-    for leaf in prediction['rice_leaves']:
-        leaf['polygon'] = _serialize_geopoints(leaf['polygon'])
-        leaf['points'] = _serialize_geopoints(leaf['points'])
-    rice_field = prediction['rice_field'].get().to_dict()
+def _serialize_rice_field_data(rice_field):
+    rice_field = dict(rice_field)
     rice_field['polygon'] = _serialize_geopoints(rice_field['polygon'])
     rice_field.pop('created_time', None)
+    return rice_field
+
+
+def _serialize_prediction_data(prediction, rice_field):
+    """
+    Serializes a prediction with its already serialized rice_field.
+    """
+    prediction['rice_leaves'] = [{
+        'polygon': _serialize_geopoints(leaf['polygon']),
+        'points': _serialize_geopoints(leaf['points']),
+        'level': leaf['level'],
+    } for leaf in prediction['rice_leaves']]
     prediction['rice_field'] = rice_field
-    prediction['created_time'] = prediction['created_time'].isoformat()
+    # Firestore stores naive datetimes as UTC, so in-memory values are serialized like the stored ones
+    created_time = prediction['created_time']
+    if created_time.tzinfo is None:
+        created_time = created_time.replace(tzinfo=timezone.utc)
+    prediction['created_time'] = created_time.isoformat()
     prediction.pop('is_deleted', None)
     return prediction
 
 
+def _phone_key(phone):
+    """
+    Derives the phones document ID of a phone number, ignoring whitespace and separators.
+    """
+    normalized = re.sub(r'[\s\-().]', '', phone)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _encode_cursor(doc):
+    """
+    Encodes the position of a prediction document (created_time and ID) as an opaque cursor string.
+    """
+    position = [doc.get('created_time').isoformat(), doc.id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        created_time, prediction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_time), prediction_id
+    except (ValueError, TypeError):
+        raise ValueError('cursor tidak valid')
+
+
+def _statistic_entry(prediction_id, prediction):
+    return {
+        'prediction_id': prediction_id,
+        'urea_required': prediction['urea_required'],
+        'yield': prediction['yield'],
+        'created_time': prediction['created_time'],
+    }
+
+
+def _shard_id(index):
+    return f'{index:06d}'
+
+
+def _shard_data(index, statistic):
+    # prediction_ids lets delete_prediction find the shard of a prediction with an array_contains query
+    return {
+        'index': index,
+        'statistic': statistic,
+        'prediction_ids': [entry['prediction_id'] for entry in statistic],
+    }
+
+
 class FirestoreClient:
-    def __init__(self):
+    def __init__(self, rice_field_cache_size=1024, rice_field_cache_ttl=60, user_cache_size=4096, user_cache_ttl=30,
+                 geometry_encoding='geopoint', change_listeners=(), stats_shard_size=500):
+        """
+        Args:
+            rice_field_cache_size (int): Maximum number of serialized rice_fields kept in memory.
+            rice_field_cache_ttl (float): Seconds a cached rice_field is served before it is read again.
+            user_cache_size (int): Maximum number of user IDs remembered as existing.
+            user_cache_ttl (float): Seconds an user is remembered as existing before it is read again.
+            geometry_encoding (str): How new predictions store rice_leaves coordinates, 'geopoint' (GeoPoint arrays)
+                                     or 'polyline' (encoded polyline strings). Both are read back transparently.
+            change_listeners (list): Callables called with the user ID after the user's data has been written.
+            stats_shard_size (int): Maximum number of statistic entries stored in one rice_field stats shard document.
+        """
+        if geometry_encoding not in ('geopoint', 'polyline'):
+            raise ValueError(f'Unknown geometry encoding: {geometry_encoding}')
+        self.encode_coordinates = encode_polyline if geometry_encoding == 'polyline' else _convert_to_geopoints
         self.db = firestore.client()
         self.users_collection = self.db.collection('users')
+        self.phones_collection = self.db.collection('phones')
         self.statistic_keys = ['urea_required', 'yield', 'created_time']
         self.summary_keys = ['season', 'paddy_age', 'planting_type', 'rice_leaves', 'image_urls', 'created_time']
+        self.list_keys = ['urea_required', 'yield', 'created_time', 'image_urls']
+        self.stats_shard_size = stats_shard_size
+
+        # Runs independent reads of one request concurrently
+        self.read_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='firestore-read')
+
+        # rice_fields are never updated after they are added, so predictions referencing them can share one read
+        self.rice_field_cache = TTLCache(maxsize=rice_field_cache_size, ttl=rice_field_cache_ttl)
+        self.rice_field_cache_lock = threading.Lock()
+
+        # Only existing users are cached, delete_user removes them (other processes notice after the TTL)
+        self.user_cache = TTLCache(maxsize=user_cache_size, ttl=user_cache_ttl)
+        self.user_cache_lock = threading.Lock()
+
+        self.change_listeners = list(change_listeners)
+
+    def add_change_listener(self, listener):
+        self.change_listeners.append(listener)
+
+    def _notify_change(self, user_id):
+        for listener in self.change_listeners:
+            listener(user_id)
+
+    def _cache_rice_field(self, rice_field_doc):
+        rice_field_data = _serialize_rice_field_data(rice_field_doc.to_dict())
+        with self.rice_field_cache_lock:
+            self.rice_field_cache[rice_field_doc.reference.path] = rice_field_data
+        return rice_field_data
+
+    def _get_rice_field_data(self, rice_field_ref):
+        """
+        Retrieves the serialized rice_field referenced by a prediction, reading Firestore only on a cache miss.
+        """
+        with self.rice_field_cache_lock:
+            rice_field_data = self.rice_field_cache.get(rice_field_ref.path)
+        if rice_field_data is None:
+            rice_field_data = self._cache_rice_field(rice_field_ref.get())
+        return dict(rice_field_data)
 
     def get_user(self, user_id):
         """
         Retrieves a specific user by ID.
         """
-        return _get_document(self.users_collection.document(user_id))
+        user_data = _get_document(self.users_collection.document(user_id))
+        if user_data:
+            with self.user_cache_lock:
+                self.user_cache[user_id] = True
+        return user_data
+
+    def user_exists(self, user_id):
+        """
+        Check if an user exists and is not deleted, reading Firestore only on a cache miss.
+        """
+        with self.user_cache_lock:
+            if user_id in self.user_cache:
+                return True
+        return self.get_user(user_id) is not None
 
-    def get_user_by_phone(self, phone):
+    def get_user_id_by_phone(self, phone):
         """
-        Check if an user with the given phone number exists.
+        Retrieves the ID of the user registered with the given phone number, or None.
         """
-        user_docs = self.users_collection.where('phone', '==', phone).where('is_deleted', '==', False).stream()
-        return next(user_docs, None)
+        phone_doc = self.phones_collection.document(_phone_key(phone)).get()
+        return phone_doc.get('user_id') if phone_doc.exists else None
 
     def add_user(self, name, phone):
         """
         Add a new user if the phone number is unique.
+
+        Returns:
+            str: The new user ID, or None if the phone number is already registered.
         """
         data = {'name': name, 'phone': phone, 'is_deleted': False}
-        return self.users_collection.add(data)[1].id
+        user_ref = self.users_collection.document()
+        phone_ref = self.phones_collection.document(_phone_key(phone))
+
+        # The phone document is the uniqueness constraint, claimed together with the user document
+        @firestore.transactional
+        def _add(transaction):
+            if phone_ref.get(transaction=transaction).exists:
+                return None
+            transaction.set(user_ref, data)
+            transaction.set(phone_ref, {'user_id': user_ref.id})
+            return user_ref.id
+
+        return _add(self.db.transaction())
+
+    def index_user_phone(self, user_id, phone):
+        """
+        Claims the phones document of an existing user, returning the ID of the user that owns the phone number.
+        """
+        phone_ref = self.phones_collection.document(_phone_key(phone))
+
+        @firestore.transactional
+        def _index(transaction):
+            phone_doc = phone_ref.get(transaction=transaction)
+            if phone_doc.exists:
+                return phone_doc.get('user_id')
+            transaction.set(phone_ref, {'user_id': user_id})
+            return user_id
+
+        return _index(self.db.transaction())
 
     def add_rice_field(self, user_id, polygon, area, max_yield):
         """
@@ -76,16 +244,33 @@ class FirestoreClient:
         geopoints = _convert_to_geopoints(polygon)
         data = {'polygon': geopoints, 'area': area, 'max_yield': max_yield, 'created_time': datetime.now()}
         user_ref.collection('rice_fields').add(data)
+        self._notify_change(user_id)
         return True
 
     def delete_user(self, user_id):
         """
-        Soft-deletes an user by ID.
+        Soft-deletes an user by ID and releases its phone number.
         """
         user_ref = self.users_collection.document(user_id)
-        if not _get_document(user_ref):
+
+        @firestore.transactional
+        def _delete(transaction):
+            user_doc = user_ref.get(transaction=transaction)
+            if not user_doc.exists or user_doc.to_dict().get('is_deleted', True):
+                return False
+            phone_ref = self.phones_collection.document(_phone_key(user_doc.get('phone')))
+            phone_doc = phone_ref.get(transaction=transaction)
+
+            transaction.update(user_ref, {'is_deleted': True})
+            if phone_doc.exists and phone_doc.get('user_id') == user_id:
+                transaction.delete(phone_ref)
+            return True
+
+        if not _delete(self.db.transaction()):
             return False
-        user_ref.update({'is_deleted': True})
+        with self.user_cache_lock:
+            self.user_cache.pop(user_id, None)
+        self._notify_change(user_id)
         return True
 
     def get_prediction(self, user_id, prediction_id):
@@ -94,40 +279,138 @@ class FirestoreClient:
         """
         prediction_data = _get_document(self.users_collection.document(user_id)
                                         .collection('predictions').document(prediction_id))
-        return _serialize_prediction_data(prediction_data) if prediction_data else None
+        if not prediction_data:
+            return None
+        return _serialize_prediction_data(prediction_data, self._get_rice_field_data(prediction_data['rice_field']))
 
-    def get_all_predictions(self, user_id, limit=10):
+    def _get_prediction_page(self, user_id, limit, cursor=None, keys=None):
         """
-        Retrieves all prediction documents for a specific user.
+        Retrieves one page of non-deleted prediction documents, newest first, after the given cursor.
         """
-        predictions_docs = self.users_collection.document(user_id).collection('predictions').where(
-            'is_deleted', '==', False).order_by('created_time', direction=firestore.Query.DESCENDING).limit(limit).stream()
+        predictions_collection = self.users_collection.document(user_id).collection('predictions')
+        query = predictions_collection.where('is_deleted', '==', False).order_by(
+            'created_time', direction=firestore.Query.DESCENDING).order_by(
+            firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING)
+        if keys:
+            query = query.select(keys)
+        if cursor:
+            created_time, prediction_id = _decode_cursor(cursor)
+            query = query.start_after({
+                'created_time': created_time,
+                firestore.FieldPath.document_id(): predictions_collection.document(prediction_id),
+            })
+        docs = list(query.limit(limit).stream())
+        next_cursor = _encode_cursor(docs[-1]) if len(docs) == limit else None
+        return docs, next_cursor
+
+    def get_all_predictions(self, user_id, limit=10, cursor=None):
+        """
+        Retrieves a page of prediction summaries for a specific user.
+
+        Returns:
+            tuple: The prediction summaries and the cursor of the next page (None on the last page).
+        """
+        # Only the list fields are transferred, not the rice_leaves GeoPoint arrays
+        predictions_docs, next_cursor = self._get_prediction_page(user_id, limit, cursor, self.list_keys)
 
         prediction_data = []
         for doc in predictions_docs:
             data = doc.to_dict()
             data['prediction_id'] = doc.id
-            data['image_url'] = data['image_urls'][0]
+            data['image_url'] = data.pop('image_urls')[0]
             data['created_time'] = data['created_time'].isoformat()
-            data.pop('season', None)
-            data.pop('paddy_age', None)
-            data.pop('image_urls', None)
-            data.pop('is_deleted', None)
-            data.pop('rice_field', None)
-            data.pop('rice_leaves', None)
-            data.pop('planting_type', None)
             prediction_data.append(data)
-        return prediction_data
+        return prediction_data, next_cursor
+
+    def iter_predictions(self, user_id, page_size=500):
+        """
+        Yields every prediction of a specific user, newest first, reading one page at a time.
+        """
+        cursor = None
+        while True:
+            predictions_docs, cursor = self._get_prediction_page(user_id, page_size, cursor)
+            for doc in predictions_docs:
+                data = doc.to_dict()
+                data['prediction_id'] = doc.id
+                data['rice_field_id'] = data.pop('rice_field').id
+                data['rice_leaves'] = [{
+                    'polygon': _serialize_geopoints(leaf['polygon']),
+                    'points': _serialize_geopoints(leaf['points']),
+                    'level': leaf['level'],
+                } for leaf in data['rice_leaves']]
+                data['created_time'] = data['created_time'].isoformat()
+                data.pop('is_deleted', None)
+                yield data
+            if not cursor:
+                return
+
+    def _get_stats_ref(self, user_id, rice_field_id):
+        return self.users_collection.document(user_id).collection('rice_field_stats').document(rice_field_id)
+
+    def _get_shards_collection(self, user_id, rice_field_id):
+        return self._get_stats_ref(user_id, rice_field_id).collection('shards')
+
+    def _query_statistic(self, user_id, rice_field_ref, transaction=None):
+        """
+        Builds the statistic series of a rice_field by scanning its predictions (statistic fields only).
+        """
+        query = self.users_collection.document(user_id).collection('predictions').where('is_deleted', '==', False).where(
+            'rice_field', '==', rice_field_ref).order_by('created_time', direction=firestore.Query.ASCENDING).select(
+            self.statistic_keys)
+        docs = transaction.get(query) if transaction else query.stream()
+        return [_statistic_entry(doc.id, doc.to_dict()) for doc in docs]
+
+    def _set_stats(self, transaction, user_id, rice_field_id, statistic, old_shard_refs=()):
+        """
+        Writes the statistic series of a rice_field as shards of at most stats_shard_size entries, replacing the
+        old shards. The stats document keeps the index of the last shard, which add_prediction appends to.
+        """
+        shards_collection = self._get_shards_collection(user_id, rice_field_id)
+        chunks = [statistic[i:i + self.stats_shard_size] for i in range(0, len(statistic), self.stats_shard_size)]
+        # An empty series still gets shard 0, so an existing shard always means the stats have been built
+        chunks = chunks or [[]]
+
+        shard_ids = set()
+        for index, chunk in enumerate(chunks):
+            shard_ref = shards_collection.document(_shard_id(index))
+            transaction.set(shard_ref, _shard_data(index, chunk))
+            shard_ids.add(shard_ref.id)
+        for shard_ref in old_shard_refs:
+            if shard_ref.id not in shard_ids:
+                transaction.delete(shard_ref)
+        transaction.set(self._get_stats_ref(user_id, rice_field_id), {'last_shard': len(chunks) - 1})
+
+    def rebuild_rice_field_stats(self, user_id, rice_field_ref):
+        """
+        Recomputes and stores the statistic shards of a rice_field from its predictions.
+
+        Returns:
+            list: The statistic entries of the rice_field, oldest first.
+        """
+        stats_ref = self._get_stats_ref(user_id, rice_field_ref.id)
+        shards_collection = self._get_shards_collection(user_id, rice_field_ref.id)
+
+        @firestore.transactional
+        def _rebuild(transaction):
+            # Reading the stats document makes a concurrent add_prediction/delete_prediction retry instead of
+            # being overwritten by the rebuilt series
+            stats_ref.get(transaction=transaction)
+            old_shard_refs = [doc.reference for doc in transaction.get(shards_collection.select([]))]
+            statistic = self._query_statistic(user_id, rice_field_ref, transaction)
+            self._set_stats(transaction, user_id, rice_field_ref.id, statistic, old_shard_refs)
+            return statistic
+
+        return _rebuild(self.db.transaction())
 
     def add_prediction(self, user_id, data, cluster_data, urls):
         """
-        Adds a new prediction document to a specific user.
+        Adds a new prediction document to a specific user and appends it to its rice_field statistic.
         """
         rice_leaves = []
         for cluster in cluster_data:
             rice_leaves.append({
-                'polygon': _convert_to_geopoints(cluster['polygon']),
-                'points': _convert_to_geopoints(cluster['points']),
+                'polygon': self.encode_coordinates(cluster['polygon']),
+                'points': self.encode_coordinates(cluster['points']),
                 'level': cluster['level'],
             })
         data.update({
@@ -136,26 +419,120 @@ class FirestoreClient:
             'is_deleted': False,
             'created_time': datetime.now()
         })
-        prediction_data = self.users_collection.document(user_id).collection('predictions').add(data)[1].get().to_dict()
-        return _serialize_prediction_data(prediction_data)
+
+        prediction_ref = self.users_collection.document(user_id).collection('predictions').document()
+        rice_field_id = data['rice_field'].id
+        stats_ref = self._get_stats_ref(user_id, rice_field_id)
+        shards_collection = self._get_shards_collection(user_id, rice_field_id)
+
+        @firestore.transactional
+        def _add(transaction):
+            stats_doc = stats_ref.get(transaction=transaction)
+            entry = _statistic_entry(prediction_ref.id, data)
+            # The first prediction of a rice_field creates its stats, including predictions written before they existed
+            if not stats_doc.exists:
+                statistic = self._query_statistic(user_id, data['rice_field'], transaction)
+                transaction.set(prediction_ref, data)
+                self._set_stats(transaction, user_id, rice_field_id, statistic + [entry])
+                return
+
+            last_shard = stats_doc.get('last_shard')
+            statistic = shards_collection.document(_shard_id(last_shard)).get(transaction=transaction).get('statistic')
+            if len(statistic) >= self.stats_shard_size:
+                last_shard, statistic = last_shard + 1, []
+            statistic.append(entry)
+            transaction.set(prediction_ref, data)
+            transaction.set(shards_collection.document(_shard_id(last_shard)), _shard_data(last_shard, statistic))
+            transaction.set(stats_ref, {'last_shard': last_shard})
+
+        _add(self.db.transaction())
+        self._notify_change(user_id)
+        # The response is built from the written data instead of reading the document back
+        return _serialize_prediction_data(dict(data), self._get_rice_field_data(data['rice_field']))
 
     def delete_prediction(self, user_id, prediction_id):
         """
-        Soft-deletes a prediction document by ID.
+        Soft-deletes a prediction document by ID and removes it from its rice_field statistic.
         """
         prediction_ref = self.users_collection.document(user_id).collection('predictions').document(prediction_id)
-        if not _get_document(prediction_ref):
+
+        @firestore.transactional
+        def _delete(transaction):
+            prediction_doc = prediction_ref.get(transaction=transaction)
+            if not prediction_doc.exists or prediction_doc.to_dict().get('is_deleted', True):
+                return False
+            rice_field_id = prediction_doc.get('rice_field').id
+            stats_ref = self._get_stats_ref(user_id, rice_field_id)
+            stats_doc = stats_ref.get(transaction=transaction)
+            shard_docs = list(transaction.get(self._get_shards_collection(user_id, rice_field_id).where(
+                'prediction_ids', 'array_contains', prediction_id).limit(1)))
+
+            transaction.update(prediction_ref, {'is_deleted': True})
+            # Stats that have not been built yet are created by the next add_prediction or the backfill script
+            if not stats_doc.exists or not shard_docs:
+                return True
+            shard = shard_docs[0].to_dict()
+            statistic = [entry for entry in shard['statistic'] if entry['prediction_id'] != prediction_id]
+            # Only the last shard is kept when empty, the others are never appended to again
+            if statistic or shard['index'] == stats_doc.get('last_shard'):
+                transaction.set(shard_docs[0].reference, _shard_data(shard['index'], statistic))
+            else:
+                transaction.delete(shard_docs[0].reference)
+            return True
+
+        if not _delete(self.db.transaction()):
             return False
-        prediction_ref.update({'is_deleted': True})
+        self._notify_change(user_id)
         return True
 
+    def get_rice_field_prediction_ids(self, user_id, rice_field_id):
+        """
+        Retrieves the IDs of the non-deleted predictions of a rice_field, oldest first, from its stats shards.
+        """
+        shard_docs = self._get_shards_collection(user_id, rice_field_id).order_by('index').select(
+            ['prediction_ids']).stream()
+        return [prediction_id for doc in shard_docs for prediction_id in doc.get('prediction_ids')]
+
+    def get_prediction_points(self, user_id, prediction_ids):
+        """
+        Retrieves the leaf points of predictions, in the given order, as [longitude, latitude, level] elements.
+        Every point gets the level of the rice_leaves cluster it was stored in.
+        """
+        if not prediction_ids:
+            return []
+        predictions_collection = self.users_collection.document(user_id).collection('predictions')
+        refs = [predictions_collection.document(prediction_id) for prediction_id in prediction_ids]
+        # get_all returns the documents in any order
+        leaves = {doc.id: doc.get('rice_leaves') for doc in self.db.get_all(refs, field_paths=['rice_leaves'])
+                  if doc.exists}
+
+        points = []
+        for prediction_id in prediction_ids:
+            for leaf in leaves.get(prediction_id, []):
+                points.extend([longitude, latitude, leaf['level']]
+                              for latitude, longitude in _serialize_geopoints(leaf['points']))
+        return points
+
     def get_latest_rice_field(self, user_id):
         """
         Retrieves the most recent rice_fields document for a specific user based on created_time.
         """
         rice_field_doc = self.users_collection.document(user_id).collection('rice_fields').order_by(
             'created_time', direction=firestore.Query.DESCENDING).limit(1).stream()
-        return next(rice_field_doc, None)
+        rice_field_doc = next(rice_field_doc, None)
+        if rice_field_doc:
+            self._cache_rice_field(rice_field_doc)
+        return rice_field_doc
+
+    def get_rice_field(self, user_id, rice_field_id):
+        """
+        Retrieves a specific rice_fields document snapshot by ID.
+        """
+        rice_field_doc = self.users_collection.document(user_id).collection('rice_fields').document(rice_field_id).get()
+        if not rice_field_doc.exists:
+            return None
+        self._cache_rice_field(rice_field_doc)
+        return rice_field_doc
 
     def get_prediction_summary_by_rice_field(self, user_id, rice_field_doc):
         rice_field_data = rice_field_doc.to_dict()
@@ -164,20 +541,43 @@ class FirestoreClient:
             'polygon': _serialize_geopoints(rice_field_data['polygon']),
         })
 
-        prediction_docs = list(self.users_collection.document(user_id).collection('predictions').where('is_deleted', '==', False).where(
-            'rice_field', '==', rice_field_doc.reference).order_by('created_time', direction=firestore.Query.ASCENDING).stream())
-        if not prediction_docs:
+        # The stats shards hold the statistic series, oldest first. They are only written by add_prediction,
+        # delete_prediction and scripts/backfill_rice_field_stats.py, never while serving a read.
+        shard_docs = self._get_shards_collection(user_id, rice_field_doc.id).order_by('index').stream()
+        statistic = [entry for doc in shard_docs for entry in doc.get('statistic')]
+        if not statistic:
             return {'rice_field': rice_field_data, 'summary': None, 'history': None}
 
         statistic_data = []
-        for doc in prediction_docs:
-            data = doc.to_dict()
-            data['created_time'] = data['created_time'].isoformat()
-            statistic_data.append({key: data[key] for key in self.statistic_keys})
-            if doc == prediction_docs[len(prediction_docs) - 1]:
-                for leaf in data['rice_leaves']:
-                    leaf['polygon'] = _serialize_geopoints(leaf['polygon'])
-                    leaf['points'] = _serialize_geopoints(leaf['points'])
-                summary_data = {key: data[key] for key in self.summary_keys}
+        for entry in statistic:
+            entry['created_time'] = entry['created_time'].isoformat()
+            statistic_data.append({key: entry[key] for key in self.statistic_keys})
+
+        data = self.users_collection.document(user_id).collection('predictions').document(
+            statistic[-1]['prediction_id']).get().to_dict()
+        data['created_time'] = data['created_time'].isoformat()
+        for leaf in data['rice_leaves']:
+            leaf['polygon'] = _serialize_geopoints(leaf['polygon'])
+            leaf['points'] = _serialize_geopoints(leaf['points'])
+        summary_data = {key: data[key] for key in self.summary_keys}
         summary_data['statistic'] = statistic_data
         return {'rice_field': rice_field_data, 'summary': summary_data}
+
+    def get_dashboard(self, user_id):
+        """
+        Retrieves an user with the latest rice_field and its prediction summary, or None if the user does not exist.
+        """
+        user_future = self.read_pool.submit(self.get_user, user_id)
+        rice_field_future = self.read_pool.submit(self.get_latest_rice_field, user_id)
+
+        user_data = user_future.result()
+        rice_field_doc = rice_field_future.result()
+        if not user_data:
+            return None
+        if not rice_field_doc:
+            user_data.update({'summary': None, 'rice_field': None})
+            return user_data
+
+        result_dict = self.get_prediction_summary_by_rice_field(user_id, rice_field_doc)
+        user_data.update({'rice_field': result_dict['rice_field'], 'summary': result_dict['summary']})
+        return user_data
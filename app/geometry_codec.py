@@ -0,0 +1,54 @@
+"""
+Compact encoding of coordinate lists as encoded polylines.
+
+Coordinates are [latitude, longitude] pairs, rounded to `precision` decimals (6 decimals is about 0.1 m), stored as
+zig-zag deltas in 5-bit chunks of printable ASCII. This is the Google encoded polyline format with a configurable
+precision, so a polygon is one short string instead of an array of GeoPoints.
+"""
+
+
+def encode_polyline(coordinates, precision=6):
+    """
+    Encode a list of [latitude, longitude] pairs as a polyline string.
+    """
+    factor = 10 ** precision
+    chunks = []
+    previous_lat, previous_lon = 0, 0
+    for coordinate in coordinates:
+        lat, lon = round(coordinate[0] * factor), round(coordinate[1] * factor)
+        _encode_value(lat - previous_lat, chunks)
+        _encode_value(lon - previous_lon, chunks)
+        previous_lat, previous_lon = lat, lon
+    return ''.join(chunks)
+
+
+def _encode_value(delta, chunks):
+    value = ~(delta << 1) if delta < 0 else delta << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def decode_polyline(encoded, precision=6):
+    """
+    Decode a polyline string into a list of [latitude, longitude] pairs.
+    """
+    factor = 10 ** precision
+    deltas = []
+    value, shift = 0, 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            deltas.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+
+    coordinates = []
+    lat, lon = 0, 0
+    for i in range(0, len(deltas) - 1, 2):
+        lat += deltas[i]
+        lon += deltas[i + 1]
+        coordinates.append([lat / factor, lon / factor])
+    return coordinates
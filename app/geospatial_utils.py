@@ -1,66 +1,196 @@
+import threading
 import alphashape
+from collections import namedtuple
+from cachetools import LRUCache
 import numpy as np
+import shapely
 from pyproj import Transformer
 from sklearn.cluster import DBSCAN
-from shapely.geometry import Point, Polygon, LineString
+from shapely.geometry import Polygon, LineString
+from .field_history import FieldHistoryStore
+
+# Prepared boundary of a rice field projected to its UTM zone, with the projected bounding box
+FieldGeometry = namedtuple('FieldGeometry', ['projected', 'bounds', 'crs'])
 
 
 class GeospatialUtils:
-    def __init__(self, epsilon_meters=10, buffer_meters=5, alpha=0.5):
+    def __init__(self, epsilon_meters=10, buffer_meters=5, alpha=0.5, field_cache_size=1024, simplify_meters=0.1,
+                 cluster_mode='auto', projected_min_points=200, field_history_size=256):
         """
         Initialize the GeospatialClustering class.
 
         Args:
             epsilon_meters (float): Radius for clustering in meters.
-            buffer_meters (float): Buffer size for polygons in meters.
+            buffer_meters (float): Buffer size for polygons in meters, applied in the field's UTM zone.
             alpha (float): Alpha parameter for alphashape (concave hull).
+            field_cache_size (int): Number of rice field boundaries kept prepared in memory.
+            simplify_meters (float): Tolerance in meters of the simplification applied to the returned polygons
+                                     (0 keeps every vertex). Areas are measured before simplifying.
+            cluster_mode (str): 'haversine' (DBSCAN on radians), 'projected' (DBSCAN with a KD-tree on the field's
+                                UTM coordinates in meters) or 'auto' to use the projected mode from
+                                projected_min_points points on.
+            projected_min_points (int): Number of points from which the 'auto' mode clusters in the UTM plane.
+            field_history_size (int): Number of rice field point histories kept in memory.
         """
+        if cluster_mode not in ('auto', 'haversine', 'projected'):
+            raise ValueError(f'Unknown cluster mode: {cluster_mode}')
         self.epsilon_meters = epsilon_meters
         self.buffer_meters = buffer_meters
         self.alpha = alpha
+        self.simplify_meters = simplify_meters
+        self.cluster_mode = cluster_mode
+        self.projected_min_points = projected_min_points
         self.earth_radius_meters = 6371008.8  # Earth's radius in meters
-        self.meters_per_degree_latitude = 111320  # Approximation for meters per degree latitude
+        self.geographic_crs = "EPSG:4326"  # WGS84
 
         self.epsilon_radians = self.epsilon_meters / self.earth_radius_meters
-        self.buffer_degrees = self.buffer_meters / self.meters_per_degree_latitude
 
-        self.transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)  # WGS84 to Web Mercator
+        # Request state stays in local variables; only per-thread transformers are kept on the shared instance
+        self._local = threading.local()
+
+        # Prepared field boundaries keyed by (user_id, rice_field_id)
+        self.field_geometries = LRUCache(maxsize=field_cache_size)
+        self._field_lock = threading.Lock()
+
+        # Leaf points of earlier predictions per rice field, clustered incrementally
+        self.field_histories = FieldHistoryStore(maxsize=field_history_size)
+
+    def _get_transformer(self, from_crs, to_crs):
+        """Return the calling thread's transformer for a CRS pair, creating it once per pair."""
+        transformers = self._local.__dict__.setdefault('transformers', {})
+        key = (from_crs, to_crs)
+        if key not in transformers:
+            transformers[key] = Transformer.from_crs(from_crs, to_crs, always_xy=True)
+        return transformers[key]
+
+    def _get_utm_crs(self, coords):
+        """Pick the UTM zone (WGS84 based) that contains the centre of an (N, 2) longitude/latitude array."""
+        longitude, latitude = coords.mean(axis=0)
+        zone = min(int((longitude + 180) // 6) + 1, 60)
+        return f"EPSG:{(32600 if latitude >= 0 else 32700) + zone}"
+
+    def _project_coords(self, coords, crs):
+        """Project an (N, 2) longitude/latitude array to an (N, 2) array in the given CRS."""
+        if not len(coords):
+            return np.empty((0, 2))
+        transformer = self._get_transformer(self.geographic_crs, crs)
+        return np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+
+    def _transform(self, geometries, from_crs, to_crs):
+        """Transform an array of geometries between two CRS with one array-based call."""
+        transformer = self._get_transformer(from_crs, to_crs)
+        return shapely.transform(
+            geometries, lambda coords: np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+        )
 
-    def _dbscan_points(self):
-        """Cluster the coordinate points using DBSCAN."""
-        db = DBSCAN(eps=self.epsilon_radians, min_samples=2, metric='haversine').fit(
-            np.radians(self.points[:, :2]))
-        self.labels = db.labels_
-        self.unique_labels = set(self.labels) - {-1}  # Exclude noise (-1)
-        self.clusters = {label: self.points[self.labels == label] for label in self.unique_labels}
-        self.noise = self.points[self.labels == -1]
+    def _get_field_geometry(self, boundary, field_key=None):
+        """Return the projected and prepared boundary of a rice field, cached by field_key when one is given."""
+        if field_key is not None:
+            with self._field_lock:
+                geometry = self.field_geometries.get(field_key)
+            if geometry is not None:
+                return geometry
+
+        boundary_coords = np.array(boundary, dtype=float)
+        crs = self._get_utm_crs(boundary_coords)
+        projected = self._transform(Polygon(boundary_coords), self.geographic_crs, crs)
+        shapely.prepare(projected)
+        geometry = FieldGeometry(projected, projected.bounds, crs)
+
+        if field_key is not None:
+            with self._field_lock:
+                self.field_geometries[field_key] = geometry
+        return geometry
+
+    def invalidate_fields(self, user_id):
+        """Drop the cached boundaries and point histories of an user's rice fields, e.g. after a new one is added."""
+        with self._field_lock:
+            for field_key in [key for key in self.field_geometries if key[0] == user_id]:
+                del self.field_geometries[field_key]
+        self.field_histories.invalidate(user_id)
+
+    def _dbscan_points(self, points, field):
+        """Cluster the coordinate points using DBSCAN and return a label per point (-1 for noise).
+
+        Dense point sets are clustered on their UTM coordinates with a KD-tree and a euclidean eps in meters
+        instead of the brute-force haversine distances.
+        """
+        if self.cluster_mode == 'projected' or (
+                self.cluster_mode == 'auto' and len(points) >= self.projected_min_points):
+            return DBSCAN(eps=self.epsilon_meters, min_samples=2, metric='euclidean', algorithm='kd_tree').fit(
+                self._project_coords(points[:, :2], field.crs)).labels_
+        return DBSCAN(eps=self.epsilon_radians, min_samples=2, metric='haversine').fit(
+            np.radians(points[:, :2])).labels_
 
-    def cluster_points(self, points, boundary):
+    def _group_points(self, points, labels):
+        """Split the points into clusters by label and the noise points."""
+        unique_labels = set(labels) - {-1}  # Exclude noise (-1)
+        clusters = {label: points[labels == label] for label in sorted(unique_labels)}
+        noise = points[labels == -1]
+        return clusters, noise
+
+    def _clip_and_measure(self, shapes, field):
+        """Buffer an array of longitude/latitude shapes and clip them to the field boundary in metric space.
+
+        Shapes whose bounding box lies inside the field's and that the prepared boundary fully contains skip the clip.
+
+        Returns:
+            tuple: Simplified exterior rings of the clipped polygons in longitude/latitude and their areas in hectares.
+        """
+        projected_shapes = self._transform(shapes, self.geographic_crs, field.crs)
+        clipped_polygons = np.asarray(shapely.buffer(projected_shapes, self.buffer_meters, quad_segs=16), dtype=object)
+
+        min_x, min_y, max_x, max_y = field.bounds
+        shape_bounds = shapely.bounds(clipped_polygons)
+        needs_clip = ~((shape_bounds[:, 0] >= min_x) & (shape_bounds[:, 1] >= min_y) &
+                       (shape_bounds[:, 2] <= max_x) & (shape_bounds[:, 3] <= max_y))
+        candidates = np.flatnonzero(~needs_clip)
+        needs_clip[candidates] = ~shapely.contains_properly(field.projected, clipped_polygons[candidates])
+        clipped_polygons[needs_clip] = shapely.intersection(clipped_polygons[needs_clip], field.projected)
+
+        exteriors = shapely.get_exterior_ring(clipped_polygons)
+        if shapely.is_missing(exteriors).any():
+            raise ValueError('Area pengecekan tanaman harus berada di dalam satu bagian lahan padi')
+
+        if self.simplify_meters:
+            exteriors = shapely.simplify(exteriors, self.simplify_meters, preserve_topology=True)
+        return self._transform(exteriors, field.crs, self.geographic_crs), shapely.area(clipped_polygons) / 10_000
+
+    def cluster_points(self, points, boundary, field_key=None, history=None):
         """Generate dictionary data for clustered coordinate points.
 
         Args:
             points (list): List of [longitude, latitude, level] elements.
             boundary (list): List of [longitude, latitude] elements.
+            field_key (tuple): Optional (user_id, rice_field_id) under which the prepared boundary is cached.
+            history (FieldHistory): Optional point history of the field (from field_histories, with its lock held).
+                                    The points are appended to it and the result covers every point in it.
 
         Returns:
-            list: A list containing clustered coordinate points with their buffered polygons, average levels, and areas in square meter.
+            list: A list containing clustered coordinate points with their buffered polygons, average levels, and areas in hectares.
         """
-        self.boundary = Polygon(boundary)
-        self.points = np.array(points)
-        self._dbscan_points()
+        # Buffering, clipping and areas use the field's UTM zone, where distances and areas are in meters
+        field = self._get_field_geometry(boundary, field_key)
+        points = np.array(points, dtype=float).reshape(-1, 3)
+        if history is not None:
+            labels = history.extend(self._project_coords(points[:, :2], field.crs), points, self.epsilon_meters)
+            points = history.points
+        else:
+            labels = self._dbscan_points(points, field)
+        clusters, noise = self._group_points(points, labels)
         result = []
 
         # Process clusters
-        for _, cluster_points in self.clusters.items():
+        cluster_shapes, shaped_clusters = [], []
+        for _, cluster_points in clusters.items():
             alpha_shape = alphashape.alphashape(cluster_points[:, :2], alpha=self.alpha)
-
             if isinstance(alpha_shape, (Polygon, LineString)):
-                buffered_shape = alpha_shape.buffer(self.buffer_degrees)
-                clipped_polygon = buffered_shape.intersection(self.boundary)
-                projected_polygon = Polygon(
-                    [self.transformer.transform(x, y) for x, y in clipped_polygon.exterior.coords]
-                )
+                cluster_shapes.append(alpha_shape)
+                shaped_clusters.append(cluster_points)
 
+        if cluster_shapes:
+            exteriors, areas = self._clip_and_measure(np.array(cluster_shapes, dtype=object), field)
+            for cluster_points, exterior, area in zip(shaped_clusters, exteriors, areas):
                 # Exclude level values of 0 during averaging
                 valid_levels = cluster_points[cluster_points[:, 2] > 0, 2]
                 if len(valid_levels) > 0:
@@ -69,25 +199,21 @@ class GeospatialUtils:
                     avg_level = 0
 
                 result.append({
-                    "points": [[point[1], point[0]] for point in cluster_points],
-                    "polygon": [[coord[1], coord[0]] for coord in clipped_polygon.exterior.coords],
+                    "points": cluster_points[:, [1, 0]].tolist(),
+                    "polygon": shapely.get_coordinates(exterior)[:, ::-1].tolist(),
                     "level": avg_level,
-                    "area": projected_polygon.area / 10_000
+                    "area": float(area)
                 })
 
         # Process noise
-        for point in self.noise:
-            noise_point = Point(point[0], point[1])
-            noise_buffer = noise_point.buffer(self.buffer_degrees)
-            clipped_polygon = noise_buffer.intersection(self.boundary)
-            projected_polygon = Polygon(
-                [self.transformer.transform(x, y) for x, y in clipped_polygon.exterior.coords]
-            )
-            result.append({
-                "points": [[point[1], point[0]]],
-                "polygon": [[coord[1], coord[0]] for coord in clipped_polygon.exterior.coords],
-                "level": int(round(point[2])),
-                "area": projected_polygon.area / 10_000
-            })
+        if len(noise):
+            exteriors, areas = self._clip_and_measure(shapely.points(noise[:, :2]), field)
+            for point, exterior, area in zip(noise, exteriors, areas):
+                result.append({
+                    "points": [[float(point[1]), float(point[0])]],
+                    "polygon": shapely.get_coordinates(exterior)[:, ::-1].tolist(),
+                    "level": int(round(point[2])),
+                    "area": float(area)
+                })
 
         return result
@@ -0,0 +1,69 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+
+class InferenceScheduler:
+    def __init__(self, forward, max_batch_size=16, max_latency_ms=10):
+        """
+        Queue inference inputs from concurrent requests and run them as micro-batches.
+
+        Args:
+            forward (callable): Function that takes a list of inputs and returns a list of results in the same order.
+            max_batch_size (int): Flush the queue once this many inputs are waiting.
+            max_latency_ms (float): Flush the queue once the oldest input has waited this long.
+        """
+        self.forward = forward
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _start(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+                self._worker.start()
+
+    def submit(self, inputs):
+        """
+        Queue the inputs and return one future per input.
+        """
+        if self._worker is None:
+            self._start()
+
+        futures = []
+        for item in inputs:
+            future = Future()
+            self._queue.put((item, future))
+            futures.append(future)
+        return futures
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            futures = [future for _, future in batch]
+            try:
+                results = self.forward([item for item, _ in batch])
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
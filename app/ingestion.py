@@ -0,0 +1,97 @@
+import io
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': 'jpeg',
+    b'\x89PNG\r\n\x1a\n': 'png',
+}
+
+
+class ImageBuffer(io.BytesIO):
+    """
+    In-memory buffer of one uploaded file that rejects files larger than max_bytes while they are streamed in.
+    """
+    def __init__(self, max_bytes=None):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def write(self, data):
+        if self.max_bytes and self.tell() + len(data) > self.max_bytes:
+            raise RequestEntityTooLarge()
+        return super().write(data)
+
+    def close(self):
+        # Views still held by running uploads keep the buffer alive; it is freed together with the last view
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+
+class IngestionRequest(Request):
+    """
+    Request that streams every uploaded file into its own ImageBuffer instead of a spooled temporary file.
+
+    The whole request is limited by MAX_CONTENT_LENGTH and every file by MAX_IMAGE_BYTES.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return ImageBuffer(current_app.config.get('MAX_IMAGE_BYTES'))
+
+
+class MemoryReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a bytes-like object, without copying it like BytesIO does for memoryviews.
+    """
+    def __init__(self, data):
+        super().__init__()
+        self.view = memoryview(data).cast('B')
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self.view[self.position:self.position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.view)}[whence]
+        self.position = max(base + offset, 0)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+
+def sniff_image_format(image_data):
+    """
+    Return 'jpeg' or 'png' from the leading magic bytes of an image, or None for any other content.
+    """
+    for signature, image_format in IMAGE_SIGNATURES.items():
+        if bytes(image_data[:len(signature)]) == signature:
+            return image_format
+    return None
+
+
+def read_images(files):
+    """
+    Return a memoryview over the uploaded bytes of every file, checking that each one is a JPEG or PNG image.
+
+    Files parsed by IngestionRequest are shared without copying; other file streams are read once.
+    """
+    images_data = []
+    for file in files:
+        if isinstance(file.stream, ImageBuffer):
+            image_data = file.stream.getbuffer()
+        else:
+            image_data = memoryview(file.read())
+        if sniff_image_format(image_data) is None:
+            raise ValueError('Format gambar harus berupa jpg, jpeg, atau png')
+        images_data.append(image_data)
+    return images_data
@@ -0,0 +1,204 @@
+import json
+import time
+import uuid
+import pickle
+import sqlite3
+import threading
+from collections import deque
+from contextlib import closing
+
+
+class InMemoryJobStore:
+    """
+    Job store kept in the memory of one process, so jobs can only be polled on the process that created them.
+    """
+    def __init__(self, finished_ttl=3600):
+        """
+        Args:
+            finished_ttl (float): Seconds a done or failed job (and its result) is kept before it is removed.
+        """
+        self.finished_ttl = finished_ttl
+        self.jobs = {}
+        self.payloads = {}
+        self.pending = deque()
+        self.condition = threading.Condition()
+
+    def _prune(self, now):
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['status'] in ('done', 'failed') and job['updated_time'] < now - self.finished_ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def create(self, job_id, user_id, payload):
+        now = time.time()
+        with self.condition:
+            self._prune(now)
+            self.jobs[job_id] = {
+                'job_id': job_id, 'user_id': user_id, 'status': 'queued', 'progress': 'queued',
+                'result': None, 'error': None, 'created_time': now, 'updated_time': now,
+            }
+            self.payloads[job_id] = payload
+            self.pending.append(job_id)
+            self.condition.notify()
+
+    def claim(self, timeout):
+        """
+        Mark the oldest queued job as running and return (job_id, payload), or None after timeout.
+        """
+        with self.condition:
+            if not self.pending and not self.condition.wait(timeout):
+                return None
+            if not self.pending:
+                return None
+            job_id = self.pending.popleft()
+            self.jobs[job_id].update({'status': 'running', 'updated_time': time.time()})
+            return job_id, self.payloads.pop(job_id)
+
+    def update(self, job_id, **fields):
+        with self.condition:
+            self.jobs[job_id].update(fields, updated_time=time.time())
+
+    def get(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+
+class SQLiteJobStore:
+    """
+    Job store backed by a SQLite file, shared by every worker process on the host.
+    """
+    def __init__(self, path, poll_interval=0.2, finished_ttl=3600, stale_after=600):
+        """
+        Args:
+            path (str): Path of the SQLite file.
+            poll_interval (float): Seconds between polls for queued jobs.
+            finished_ttl (float): Seconds a done or failed job (and its result) is kept before it is removed.
+            stale_after (float): Seconds without progress after which a running job is considered lost.
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self.finished_ttl = finished_ttl
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'job_id TEXT PRIMARY KEY, user_id TEXT, status TEXT, progress TEXT, payload BLOB, '
+                'result TEXT, error TEXT, created_time REAL, updated_time REAL)'
+            )
+            # Jobs of a crashed process stay running forever; the payload is gone, so they can only be failed.
+            # Running jobs of live processes report progress on every stage and are not stale.
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_time = ? "
+                "WHERE status = 'running' AND updated_time < ?",
+                ('Pekerjaan terhenti sebelum selesai', time.time(), time.time() - stale_after)
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def create(self, job_id, user_id, payload):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_time < ?",
+                (now - self.finished_ttl,)
+            )
+            conn.execute(
+                'INSERT INTO jobs VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?)',
+                (job_id, user_id, 'queued', 'queued', pickle.dumps(payload), now, now)
+            )
+
+    def claim(self, timeout):
+        """
+        Mark the oldest queued job as running and return (job_id, payload), or None after timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with closing(self._connect()) as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute(
+                    "SELECT job_id, payload FROM jobs WHERE status = 'queued' ORDER BY created_time LIMIT 1"
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', payload = NULL, updated_time = ? WHERE job_id = ?",
+                        (time.time(), row[0])
+                    )
+                conn.execute('COMMIT')
+
+            if row:
+                return row[0], pickle.loads(row[1])
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def update(self, job_id, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'])
+        fields['updated_time'] = time.time()
+        columns = ', '.join(f'{column} = ?' for column in fields)
+        with closing(self._connect()) as conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE job_id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                'SELECT job_id, user_id, status, progress, result, error, created_time, updated_time '
+                'FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+class JobQueue:
+    def __init__(self, store, handler, workers=2):
+        """
+        Run queued jobs on background worker threads.
+
+        Args:
+            store: InMemoryJobStore, SQLiteJobStore or any store with the same methods.
+            handler (callable): Called as handler(payload, report_progress) and returns a JSON-serializable result.
+            workers (int): Number of worker threads.
+        """
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f'job-worker-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, user_id, payload):
+        """
+        Queue a job and return its id.
+        """
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, user_id, payload)
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _work(self):
+        while True:
+            claimed = self.store.claim(timeout=1)
+            if not claimed:
+                continue
+
+            job_id, payload = claimed
+            try:
+                result = self.handler(payload, lambda stage: self.store.update(job_id, progress=stage))
+                self.store.update(job_id, status='done', progress='done', result=result)
+            except Exception as e:
+                self.store.update(job_id, status='failed', error=str(e))
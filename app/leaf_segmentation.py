@@ -1,7 +1,8 @@
 import cv2
 import numpy as np
-from io import BytesIO
+from PIL import Image
 from scipy import ndimage
+from .ingestion import MemoryReader
 
 
 class LeafSegmentation:
@@ -9,7 +10,36 @@ class LeafSegmentation:
     filter_sigma = 5
     otsu_threshold_min = 0
     otsu_threshold_max = 255
+    brightness_alpha = 1.2
+    brightness_beta = 50
     SE = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (15, 15))
+    reduced_decode_flags = {8: cv2.IMREAD_REDUCED_COLOR_8, 4: cv2.IMREAD_REDUCED_COLOR_4, 2: cv2.IMREAD_REDUCED_COLOR_2}
+
+    def __init__(self, working_size=None):
+        """
+        Args:
+            working_size (int): Longest image side in pixels used for segmentation, None keeps the full resolution.
+        """
+        self.working_size = working_size
+
+    def _decode(self, image_data):
+        image_np = np.frombuffer(image_data, np.uint8)
+        if not self.working_size:
+            return cv2.imdecode(image_np, cv2.COLOR_RGB2BGR)
+
+        # Only the header is parsed here, without copying the bytes; JPEGs are then decoded at 1/2, 1/4 or 1/8 scale
+        longest_side = max(Image.open(MemoryReader(image_data)).size)
+        flags = cv2.COLOR_RGB2BGR
+        for factor, reduced_flags in self.reduced_decode_flags.items():
+            if longest_side // factor >= self.working_size:
+                flags = reduced_flags
+                break
+        image_rgb = cv2.imdecode(image_np, flags)
+
+        scale = self.working_size / max(image_rgb.shape[:2])
+        if scale < 1:
+            image_rgb = cv2.resize(image_rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return image_rgb
 
     def _create_otsu_mask(self, img):
         mask = cv2.threshold(img, self.otsu_threshold_min, self.otsu_threshold_max, cv2.THRESH_OTSU)[1]
@@ -17,22 +47,21 @@ class LeafSegmentation:
         mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.SE)
         return ndimage.binary_fill_holes(mask)
 
-    def _refine_segmentation(self, img):
-        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        brightened_img = cv2.convertScaleAbs(gray_img, alpha=1.2, beta=50)
-        binary_mask = cv2.threshold(brightened_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    def _create_channel_mask(self, channel):
+        channel = cv2.equalizeHist(channel)
+        channel = cv2.GaussianBlur(channel, self.filter_size, self.filter_sigma)
+        return self._create_otsu_mask(channel)
+
+    def _refine_mask(self, brightened_img, mask):
+        # Same as brightening the grayscale of the masked image: masked-out pixels become brightness_beta
+        masked_img = np.full_like(brightened_img, self.brightness_beta)
+        np.copyto(masked_img, brightened_img, where=mask)
+        binary_mask = cv2.threshold(masked_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
         contours = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
         largest_contour = max(contours, key=cv2.contourArea)
         refined_mask = np.zeros_like(binary_mask)
         cv2.drawContours(refined_mask, [largest_contour], -1, 255, thickness=cv2.FILLED)
-        return cv2.bitwise_and(img, img, mask=refined_mask)
-
-    def _process_channel(self, img_copy, channel):
-        channel = cv2.equalizeHist(channel)
-        channel = cv2.GaussianBlur(channel, self.filter_size, self.filter_sigma)
-        mask = self._create_otsu_mask(channel)
-        img_copy[mask == 0] = 0
-        return self._refine_segmentation(img_copy)
+        return mask & (refined_mask > 0)
 
     def _fill_background(self, img, fill_value):
         gray_mask = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -42,10 +71,8 @@ class LeafSegmentation:
         filled_background = cv2.bitwise_and(background, background, mask=inverted_mask)
         return cv2.add(img, filled_background)
 
-    def segment(self, image_file):
-        image_stream = BytesIO(image_file.read())
-        image_np = np.frombuffer(image_stream.getvalue(), np.uint8)
-        image_rgb = cv2.imdecode(image_np, cv2.COLOR_RGB2BGR)
+    def segment(self, image_data):
+        image_rgb = self._decode(image_data)
         blue, green, red = cv2.split(image_rgb)
         channels = [
             cv2.subtract(green, red),
@@ -53,8 +80,14 @@ class LeafSegmentation:
             cv2.divide(green, red),
         ]
 
-        combined_result = self._process_channel(np.copy(image_rgb), channels[0])
-        for channel in channels[1:]:
-            refined_result = self._process_channel(np.copy(image_rgb), channel)
-            combined_result = cv2.bitwise_and(combined_result, refined_result)
+        # Every channel is refined on the same grayscale plane, so only the masks differ between channels
+        gray_img = cv2.cvtColor(image_rgb, cv2.COLOR_BGR2GRAY)
+        brightened_img = cv2.convertScaleAbs(gray_img, alpha=self.brightness_alpha, beta=self.brightness_beta)
+
+        combined_mask = np.ones(gray_img.shape, dtype=bool)
+        for channel in channels:
+            mask = self._create_channel_mask(channel)
+            combined_mask &= self._refine_mask(brightened_img, mask)
+
+        combined_result = cv2.bitwise_and(image_rgb, image_rgb, mask=combined_mask.astype(np.uint8))
         return self._fill_background(combined_result, 255)
@@ -0,0 +1,144 @@
+import copy
+import time
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval, fuse_linear_bn_eval
+from torch.ao.quantization import quantize_dynamic
+from .prediction_utils import build_classification_model
+
+INPUT_SHAPE = (3, 100, 100)
+
+
+def load_eager_model(weights_path):
+    """
+    Load the classifier state dict on CPU in eval mode.
+    """
+    model = build_classification_model()
+    model.load_state_dict(torch.load(weights_path, map_location='cpu', weights_only=True))
+    return model.eval()
+
+
+def fuse_batchnorm(model):
+    """
+    Fold every BatchNorm that directly follows a convolution or linear layer into that layer.
+
+    DenseNet normalizes before each activation, so only conv0/norm0, conv1/norm2 of each dense layer
+    and the Linear/BatchNorm1d pair of the classifier can be folded.
+    """
+    model = copy.deepcopy(model).eval()
+    features = model.features
+    features.conv0 = fuse_conv_bn_eval(features.conv0, features.norm0)
+    features.norm0 = nn.Identity()
+
+    for module in features.modules():
+        if hasattr(module, 'conv1') and hasattr(module, 'norm2'):
+            module.conv1 = fuse_conv_bn_eval(module.conv1, module.norm2)
+            module.norm2 = nn.Identity()
+
+    model.classifier[1] = fuse_linear_bn_eval(model.classifier[1], model.classifier[2])
+    model.classifier[2] = nn.Identity()
+    return model
+
+
+def export_torchscript(model, output_path, quantize=False):
+    """
+    Trace, freeze and save the model as TorchScript, optionally with int8 dynamic quantization of linear layers.
+
+    optimize_for_inference rewrites the graph for MKLDNN on the CPU, so the artifact only runs on the CPU.
+    """
+    if quantize:
+        model = quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.randn(1, *INPUT_SHAPE))
+    optimized = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    torch.jit.save(optimized, output_path)
+    return output_path
+
+
+def export_onnx(model, output_path, quantize=None, calibration_batches=None):
+    """
+    Export the model to ONNX with a dynamic batch axis.
+
+    Args:
+        quantize (str): None, 'dynamic' or 'static' int8 quantization through onnxruntime.
+        calibration_batches (list): Input batches (tensors) used to calibrate static quantization.
+    """
+    export_path = output_path if not quantize else f'{output_path}.fp32'
+    torch.onnx.export(
+        model, torch.randn(1, *INPUT_SHAPE), export_path,
+        input_names=['input'], output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        do_constant_folding=True
+    )
+    if not quantize:
+        return output_path
+
+    from onnxruntime.quantization import QuantType, CalibrationDataReader, quantize_dynamic as ort_quantize_dynamic, \
+        quantize_static as ort_quantize_static
+
+    if quantize == 'dynamic':
+        ort_quantize_dynamic(export_path, output_path, weight_type=QuantType.QInt8)
+    elif quantize == 'static':
+        if not calibration_batches:
+            raise ValueError('Static quantization requires calibration batches')
+
+        class _BatchReader(CalibrationDataReader):
+            def __init__(self, batches):
+                self.batches = iter(batches)
+
+            def get_next(self):
+                batch = next(self.batches, None)
+                return None if batch is None else {'input': batch.numpy()}
+
+        ort_quantize_static(export_path, output_path, _BatchReader(calibration_batches),
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    else:
+        raise ValueError(f'Unknown quantization mode: {quantize}')
+    return output_path
+
+
+def load_runner(backend, path):
+    """
+    Return a callable that maps an input batch tensor to logits for an exported artifact.
+    """
+    if backend == 'torchscript':
+        return torch.jit.load(path, map_location='cpu').eval()
+
+    import onnxruntime
+    session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+    return lambda batch: torch.from_numpy(session.run(None, {input_name: batch.numpy()})[0])
+
+
+def compare(reference, candidate, batches):
+    """
+    Compare a candidate runner against the reference model on the given batches.
+
+    Returns:
+        dict: Maximum absolute logit difference, top-1 agreement ratio and the mean
+              latency (ms per batch) and throughput (images per second) of both runners.
+    """
+    max_diff, agreed, total = 0.0, 0, 0
+    timings = {'reference': 0.0, 'candidate': 0.0}
+    with torch.no_grad():
+        for batch in batches:
+            start = time.perf_counter()
+            expected = reference(batch)
+            timings['reference'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = candidate(batch)
+            timings['candidate'] += time.perf_counter() - start
+
+            max_diff = max(max_diff, (expected - actual).abs().max().item())
+            agreed += (expected.argmax(1) == actual.argmax(1)).sum().item()
+            total += len(batch)
+
+    return {
+        'max_abs_diff': max_diff,
+        'top1_agreement': agreed / total,
+        'reference_ms_per_batch': 1000 * timings['reference'] / len(batches),
+        'candidate_ms_per_batch': 1000 * timings['candidate'] / len(batches),
+        'reference_images_per_second': total / timings['reference'],
+        'candidate_images_per_second': total / timings['candidate'],
+    }
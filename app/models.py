@@ -1,21 +1,92 @@
 from flask_restful import Resource, abort
-from flask import request
+from flask import request, current_app, Response, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
 from functools import wraps
-from .firestore import FirestoreClient
-from .prediction_utils import PredictionUtils
+from .prediction_cache import PredictionCache
 from .auth_utils import verify_token, generate_token
-from .upload_image import upload_to_cloudinary
-from .geospatial_utils import GeospatialUtils
+from .upload_image import submit_uploads, collect_uploads, discard_uploads
+from .ingestion import read_images
+from .stage_timer import StageTimer
+from .yield_utils import predict_yield
+from .services import LazyService, startup_report
+from .jobs import JobQueue, InMemoryJobStore, SQLiteJobStore
+from .response_cache import ResponseCache, InMemoryResponseBackend, SQLiteResponseBackend
+from datetime import datetime, timezone
 import json
-
-# Initialize Firestore client
-firestore_client = FirestoreClient()
-
-# Initialize Prediction Utils
-prediction_utils = PredictionUtils()
-
-# Initialize Prediction Utils
-geospatial_utils = GeospatialUtils()
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _prediction_utils_config():
+    batching_latency_ms = os.getenv('LCC_BATCH_LATENCY_MS')
+    return dict(
+        max_batch_size=int(os.getenv('LCC_MAX_BATCH_SIZE', 16)),
+        batching_latency_ms=float(batching_latency_ms) if batching_latency_ms else None,
+        segmentation_workers=int(os.getenv('SEGMENTATION_WORKERS', 0)) or None,
+        segmentation_working_size=int(os.getenv('SEGMENTATION_WORKING_SIZE', 0)) or None,
+        prediction_cache=PredictionCache(
+            maxsize=int(os.getenv('PREDICTION_CACHE_SIZE', 1024)),
+            ttl=float(os.getenv('PREDICTION_CACHE_TTL', 3600)),
+            cache_dir=os.getenv('PREDICTION_CACHE_DIR'),
+            disk_max_entries=int(os.getenv('PREDICTION_CACHE_DISK_MAX_ENTRIES', 10000))
+        ) if os.getenv('PREDICTION_CACHE_SIZE') != '0' else None,
+        backend=os.getenv('MODEL_BACKEND', 'eager'),
+        model_path=os.getenv('MODEL_PATH')
+    )
+
+
+def _build_response_cache():
+    backend = os.getenv('RESPONSE_CACHE', 'memory')
+    if backend == 'none':
+        return None
+    if backend == 'sqlite':
+        ttl = float(os.getenv('RESPONSE_CACHE_TTL', 300))
+        return ResponseCache(SQLiteResponseBackend(os.getenv('RESPONSE_CACHE_PATH', 'response_cache.db'), ttl=ttl))
+    # Per-process cache: other worker processes serve stale responses for at most the (short) TTL after a write
+    ttl = float(os.getenv('RESPONSE_CACHE_TTL', 10))
+    return ResponseCache(InMemoryResponseBackend(maxsize=int(os.getenv('RESPONSE_CACHE_SIZE', 1024)), ttl=ttl))
+
+
+# GET responses per user, invalidated by FirestoreClient whenever the user's data is written
+response_cache = _build_response_cache()
+
+
+def _firestore_client_config():
+    return dict(
+        rice_field_cache_size=int(os.getenv('RICE_FIELD_CACHE_SIZE', 1024)),
+        rice_field_cache_ttl=float(os.getenv('RICE_FIELD_CACHE_TTL', 60)),
+        user_cache_size=int(os.getenv('USER_CACHE_SIZE', 4096)),
+        user_cache_ttl=float(os.getenv('USER_CACHE_TTL', 30)),
+        geometry_encoding=os.getenv('GEOMETRY_ENCODING', 'geopoint'),
+        change_listeners=[response_cache.invalidate] if response_cache else []
+    )
+
+
+def _geospatial_utils_config():
+    return dict(
+        simplify_meters=float(os.getenv('POLYGON_SIMPLIFY_METERS', 0.1)),
+        cluster_mode=os.getenv('CLUSTER_MODE', 'auto'),
+        projected_min_points=int(os.getenv('CLUSTER_PROJECTED_MIN_POINTS', 200)),
+        field_history_size=int(os.getenv('FIELD_HISTORY_SIZE', 256))
+    )
+
+
+# Services are imported and built on first use so lightweight routes do not wait for torch/sklearn
+firestore_client = LazyService('firestore_client', '.firestore', 'FirestoreClient', _firestore_client_config)
+prediction_utils = LazyService('prediction_utils', '.prediction_utils', 'PredictionUtils', _prediction_utils_config)
+geospatial_utils = LazyService('geospatial_utils', '.geospatial_utils', 'GeospatialUtils', _geospatial_utils_config)
+prediction_services = [prediction_utils, geospatial_utils]
+
+
+def warm_up():
+    """
+    Build the heavy prediction services ahead of the first prediction request.
+    """
+    for service in prediction_services:
+        service.warm_up()
 
 
 def token_required(f):  # Decorator for token validation
@@ -36,6 +107,27 @@ def token_required(f):  # Decorator for token validation
     return decorated
 
 
+def cached_response(f):  # Decorator for per-user response caching, applied below token_required
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not response_cache:
+            return f(*args, **kwargs)
+
+        key = response_cache.key(request.user_id, request.full_path)
+        entry = response_cache.get(key)
+        if not entry:
+            result = f(*args, **kwargs)
+            if isinstance(result, Response) or result[1] != 200:
+                return result
+            entry = response_cache.set(key, result[0], result[2] if len(result) > 2 else None)
+
+        # Unchanged responses are answered without a body and without reading Firestore
+        if request.if_none_match.contains_weak(entry['etag']):
+            return Response(status=304, headers={'ETag': f'"{entry["etag"]}"'})
+        return entry['data'], 200, {**entry['headers'], 'ETag': f'"{entry["etag"]}"'}
+    return decorated
+
+
 def _validate_points(points, field_name='points'):
     """
     Validate that points is a list containing list of valid latitude (first element) and longitude (second element).
@@ -51,6 +143,96 @@ def _validate_points(points, field_name='points'):
             raise ValueError('Nilai latitude atau longitude tidak valid')
 
 
+def _run_prediction(user_id, rice_field_doc, fields, images_data, report_progress=lambda stage: None, timer=None):
+    """
+    Run the prediction pipeline for validated input (images as encoded bytes) and store the result.
+
+    The Cloudinary upload does not depend on any model output, so it runs alongside inference,
+    clustering and yield prediction and is only joined before the Firestore write.
+    """
+    timer = timer or StageTimer()
+    rice_field_data = rice_field_doc.to_dict()
+    season, planting_type, paddy_age, points = (
+        fields['season'], fields['planting_type'], fields['paddy_age'], fields['points']
+    )
+
+    # Start uploading all images to Cloudinary in the background
+    upload_start = time.perf_counter()
+    upload_futures, upload_deadline = submit_uploads(images_data)
+    upload_ends = []
+    for future in upload_futures:
+        future.add_done_callback(lambda _: upload_ends.append(time.perf_counter()))
+
+    try:
+        # Retrieve nutrition (nitrogen) prediction
+        report_progress('nutrition')
+        with timer.stage('nutrition'):
+            levels, urea_required = prediction_utils.predict_nutrition(
+                images_data, season, planting_type, paddy_age, rice_field_data['area']
+            )
+
+        # Cluster points using dbscan
+        report_progress('clustering')
+        with timer.stage('clustering'):
+            point_levels = [[point[1], point[0], level] for point, level in zip(points, levels)]
+            boundary_coords = [[point.longitude, point.latitude] for point in rice_field_data['polygon']]
+            dbscan_result = geospatial_utils.cluster_points(
+                point_levels, boundary_coords, field_key=(user_id, rice_field_doc.id)
+            )
+
+        # Retrieve yield prediction
+        with timer.stage('yield'):
+            lcc_areas = [(dbscan_data["area"], dbscan_data["level"]) for dbscan_data in dbscan_result]
+            current_yield = predict_yield(rice_field_data['area'], lcc_areas, planting_type)
+    except Exception:
+        # A failed prediction keeps none of its images: queued uploads are cancelled, finished ones deleted
+        discard_uploads(upload_futures)
+        raise
+
+    # Join the uploads
+    report_progress('upload')
+    with timer.stage('upload_wait'):
+        secure_urls = collect_uploads(upload_futures, upload_deadline)
+    timer.record('upload', upload_start, max(upload_ends, default=None))
+
+    data = {
+        'season': season,
+        'planting_type': planting_type,
+        'paddy_age': paddy_age,
+        'urea_required': urea_required,
+        'yield': current_yield,
+        'rice_field': rice_field_doc.reference,
+    }
+
+    report_progress('saving')
+    with timer.stage('saving'):
+        try:
+            prediction_data = firestore_client.add_prediction(user_id, data, dbscan_result, secure_urls)
+        except Exception:
+            discard_uploads(upload_futures)
+            raise
+    logger.info('Prediction stages for user %s: %s', user_id, timer.server_timing())
+    return prediction_data
+
+
+def _process_prediction_job(payload, report_progress):
+    """
+    Run a queued prediction job from the job queue workers.
+    """
+    rice_field_doc = firestore_client.get_rice_field(payload['user_id'], payload['rice_field_id'])
+    if not rice_field_doc:
+        raise ValueError('Lahan padi tidak ditemukan')
+    return _run_prediction(payload['user_id'], rice_field_doc, payload['fields'], payload['images'], report_progress)
+
+
+# Background prediction jobs, stored in SQLite when JOB_STORE_PATH is set so every worker process shares them.
+# The in-memory store only works with a single worker process.
+_job_ttl = float(os.getenv('JOB_RESULT_TTL', 3600))
+job_store = SQLiteJobStore(os.getenv('JOB_STORE_PATH'), finished_ttl=_job_ttl) if os.getenv('JOB_STORE_PATH') \
+    else InMemoryJobStore(finished_ttl=_job_ttl)
+job_queue = JobQueue(job_store, _process_prediction_job, workers=int(os.getenv('JOB_WORKERS', 2)))
+
+
 class LoginModel(Resource):
     def post(self):
         """
@@ -64,16 +246,17 @@ class LoginModel(Resource):
         if not isinstance(phone, str) or not phone.strip():
             abort(400, pesan='phone harus berupa string dan tidak boleh kosong')
 
-        user_doc = firestore_client.get_user_by_phone(phone.strip())
-        if not user_doc:
+        user_id = firestore_client.get_user_id_by_phone(phone.strip())
+        if not user_id:
             abort(404, pesan='Akun tidak ditemukan')
 
-        token = generate_token(user_doc.id)
+        token = generate_token(user_id)
         return {'pesan': 'Login berhasil', 'token': token}, 200
 
 
 class UserModel(Resource):
     @token_required
+    @cached_response
     def get(self):
         """
         Get an user by user_id
@@ -82,23 +265,9 @@ class UserModel(Resource):
         if not user_id:
             abort(400, pesan='user_id diperlukan')
 
-        user_data = firestore_client.get_user(user_id)
+        user_data = firestore_client.get_dashboard(user_id)
         if not user_data:
             abort(404, pesan='Akun tidak ditemukan')
-
-        rice_field_doc = firestore_client.get_latest_rice_field(user_id)
-        if not rice_field_doc:
-            user_data.update({
-                'summary': None,
-                'rice_field': None,
-            })
-            return user_data, 200
-
-        result_dict = firestore_client.get_prediction_summary_by_rice_field(user_id, rice_field_doc)
-        user_data.update({
-            'rice_field': result_dict['rice_field'],
-            'summary': result_dict['summary'],
-        })
         return user_data, 200
 
     def post(self):
@@ -117,10 +286,10 @@ class UserModel(Resource):
         name = name.strip()
         phone = phone.strip()
 
-        if firestore_client.get_user_by_phone(phone):
+        user_id = firestore_client.add_user(name, phone)
+        if not user_id:
             abort(400, pesan='Nomor HP sudah terdaftar')
 
-        user_id = firestore_client.add_user(name, phone)
         token = generate_token(user_id)
         return {'pesan': 'Pendaftaran akun berhasil', 'token': token}, 201
 
@@ -150,10 +319,12 @@ class UserModel(Resource):
         except ValueError as e:
             abort(400, pesan=str(e))
 
-        max_yield = prediction_utils.predict_yield(area, [])
+        max_yield = predict_yield(area, [])
         success = firestore_client.add_rice_field(user_id, polygon, area, max_yield)
         if not success:
             abort(404, pesan='Akun tidak ditemukan')
+        if geospatial_utils.ready:
+            geospatial_utils.invalidate_fields(user_id)
         return {'pesan': 'Area lahan padi berhasil diperbarui'}, 200
 
     @token_required
@@ -173,6 +344,7 @@ class UserModel(Resource):
 
 class PredictionModel(Resource):
     @token_required
+    @cached_response
     def get(self, prediction_id=None):
         """
         Get a specific prediction or all predictions for an user.
@@ -181,18 +353,50 @@ class PredictionModel(Resource):
         if not user_id:
             abort(400, pesan='user_id diperlukan')
 
-        user_data = firestore_client.get_user(user_id)
-        if not user_data:
+        if not prediction_id and request.args.get('format') == 'ndjson':
+            return self._export(user_id)
+
+        # The user check and the prediction query do not depend on each other
+        if prediction_id:
+            prediction_future = firestore_client.read_pool.submit(firestore_client.get_prediction, user_id, prediction_id)
+        else:
+            try:
+                limit = int(request.args.get('limit', 10))
+            except ValueError:
+                abort(400, pesan='limit harus berupa angka')
+            if not 1 <= limit <= 100:
+                abort(400, pesan='limit harus bernilai 1 sampai 100')
+            prediction_future = firestore_client.read_pool.submit(
+                firestore_client.get_all_predictions, user_id, limit, request.args.get('cursor'))
+
+        if not firestore_client.user_exists(user_id):
             abort(404, pesan='Akun tidak ditemukan')
 
         if prediction_id:
-            prediction_data = firestore_client.get_prediction(user_id, prediction_id)
+            prediction_data = prediction_future.result()
             if not prediction_data:
                 abort(404, pesan='Pengecekan tanaman tidak ditemukan')
             return prediction_data, 200
-        else:
-            prediction_data = firestore_client.get_all_predictions(user_id)
-            return prediction_data, 200
+
+        try:
+            prediction_data, next_cursor = prediction_future.result()
+        except ValueError as e:
+            abort(400, pesan=str(e))
+        return prediction_data, 200, {'X-Next-Cursor': next_cursor} if next_cursor else {}
+
+    @staticmethod
+    def _export(user_id):
+        """
+        Stream every prediction of an user as newline-delimited JSON.
+        """
+        if not firestore_client.user_exists(user_id):
+            abort(404, pesan='Akun tidak ditemukan')
+
+        def generate():
+            for prediction in firestore_client.iter_predictions(user_id):
+                yield json.dumps(prediction) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
     @token_required
     def post(self):
@@ -203,14 +407,12 @@ class PredictionModel(Resource):
         if not user_id:
             abort(400, pesan='user_id diperlukan')
 
-        user_data = firestore_client.get_user(user_id)
-        if not user_data:
+        if not firestore_client.user_exists(user_id):
             abort(404, pesan='Akun tidak ditemukan')
 
         rice_field_doc = firestore_client.get_latest_rice_field(user_id)
         if not rice_field_doc:
             abort(400, pesan='Anda perlu melakukan scan lahan terlebih dahulu')
-        rice_field_data = rice_field_doc.to_dict()
 
         try:
             payload = json.loads(request.form.get('payload', '{}'))
@@ -243,45 +445,38 @@ class PredictionModel(Resource):
 
             # Validate uploaded images
             if 'images' not in request.files:
-                raise ValueError(pesan='images diperlukan')
+                raise ValueError('images diperlukan')
             images = request.files.getlist('images')
             if len(images) > 10:
                 raise ValueError('Maksimal 10 gambar dapat diunggah')
-            for image in images:
-                if image.filename == '' or not image.filename.endswith(('.jpg', '.jpeg', '.png')):
-                    raise ValueError('Format gambar harus berupa jpg, jpeg, atau png')
             if len(images) != len(points):
                 raise ValueError('Jumlah gambar harus sama dengan jumlah koordinat')
 
-            # Retrieve nutrition (nitrogen) prediction
-            levels, urea_required = prediction_utils.predict_nutrition(
-                images, season, planting_type, paddy_age, rice_field_data['area']
-            )
-
-            # Cluster points using dbscan
-            point_levels = [[point[1], point[0], level] for point, level in zip(points, levels)]
-            boundary_coords = [[point.longitude, point.latitude] for point in rice_field_data['polygon']]
-            dbscan_result = geospatial_utils.cluster_points(point_levels, boundary_coords)
-
-            # Retrieve yield prediction
-            lcc_areas = [(dbscan_data["area"], dbscan_data["level"]) for dbscan_data in dbscan_result]
-            current_yield = prediction_utils.predict_yield(rice_field_data['area'], lcc_areas, planting_type)
-
-            # Upload all images to Cloudinary
-            secure_urls = upload_to_cloudinary(images)
-            # secure_urls = ['' for i in points]
-
-            data = {
+            # The format is checked from the content; segmentation, hashing and upload share one view per image
+            images_data = read_images(images)
+            fields = {
                 'season': season,
                 'planting_type': planting_type,
                 'paddy_age': paddy_age,
-                'urea_required': urea_required,
-                'yield': current_yield,
-                'rice_field': rice_field_doc.reference,
+                'points': points,
             }
 
-            prediction_data = firestore_client.add_prediction(user_id, data, dbscan_result, secure_urls)
-            return prediction_data, 201
+            if request.args.get('async', '').lower() == 'true':
+                job_payload = {
+                    'user_id': user_id,
+                    'rice_field_id': rice_field_doc.id,
+                    'fields': fields,
+                    # Queued jobs outlive the request buffers (and may be pickled), so they keep their own copy
+                    'images': [bytes(image_data) for image_data in images_data],
+                }
+                job_id = job_queue.submit(user_id, job_payload)
+                return {'pesan': 'Pengecekan tanaman sedang diproses', 'job_id': job_id}, 202
+
+            timer = StageTimer()
+            prediction_data = _run_prediction(user_id, rice_field_doc, fields, images_data, timer=timer)
+            return prediction_data, 201, {'Server-Timing': timer.server_timing()}
+        except RequestEntityTooLarge:
+            abort(413, pesan='Ukuran gambar melebihi batas')
         except ValueError as e:
             abort(400, pesan=str(e))
         except json.JSONDecodeError:
@@ -298,8 +493,7 @@ class PredictionModel(Resource):
         if not user_id:
             abort(400, pesan='user_id diperlukan')
 
-        user_data = firestore_client.get_user(user_id)
-        if not user_data:
+        if not firestore_client.user_exists(user_id):
             abort(404, pesan='Akun tidak ditemukan')
 
         if not prediction_id:
@@ -310,3 +504,94 @@ class PredictionModel(Resource):
             abort(404, pesan='Pengecekan tanaman tidak ditemukan')
 
         return {'pesan': 'Pengecekan tanaman berhasil dihapus'}, 200
+
+
+class PredictionJobModel(Resource):
+    @token_required
+    def get(self, job_id):
+        """
+        Get the progress and result of an asynchronous prediction job.
+        """
+        user_id = request.user_id
+        if not user_id:
+            abort(400, pesan='user_id diperlukan')
+
+        job = job_queue.get(job_id)
+        if not job or job['user_id'] != user_id:
+            abort(404, pesan='Pekerjaan tidak ditemukan')
+
+        data = {
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'progress': job['progress'],
+            'created_time': datetime.fromtimestamp(job['created_time'], timezone.utc).isoformat(),
+        }
+        if job['status'] == 'done':
+            data['result'] = job['result']
+        elif job['status'] == 'failed':
+            data['pesan'] = job['error']
+        return data, 200
+
+
+class RiceFieldClusterModel(Resource):
+    @token_required
+    @cached_response
+    def get(self):
+        """
+        Cluster the leaf points of every prediction of the user's latest rice_field together.
+        """
+        user_id = request.user_id
+        if not user_id:
+            abort(400, pesan='user_id diperlukan')
+
+        if not firestore_client.user_exists(user_id):
+            abort(404, pesan='Akun tidak ditemukan')
+
+        rice_field_doc = firestore_client.get_latest_rice_field(user_id)
+        if not rice_field_doc:
+            abort(400, pesan='Anda perlu melakukan scan lahan terlebih dahulu')
+
+        field_key = (user_id, rice_field_doc.id)
+        boundary_coords = [[point.longitude, point.latitude] for point in rice_field_doc.get('polygon')]
+        history = geospatial_utils.field_histories.get(field_key)
+        with history.lock:
+            prediction_ids = firestore_client.get_rice_field_prediction_ids(user_id, rice_field_doc.id)
+            # A deleted prediction cannot be taken out of the union-find, so its field history starts over
+            if not history.prediction_ids.issubset(prediction_ids):
+                history.clear()
+
+            # Only the predictions added since the last request are read and clustered
+            new_ids = [prediction_id for prediction_id in prediction_ids if prediction_id not in history.prediction_ids]
+            points = firestore_client.get_prediction_points(user_id, new_ids)
+            try:
+                clusters = geospatial_utils.cluster_points(points, boundary_coords, field_key, history=history)
+            except Exception as e:
+                # The points may already be in the history without their prediction IDs
+                history.clear()
+                if isinstance(e, ValueError):
+                    abort(400, pesan=str(e))
+                raise
+            history.prediction_ids.update(new_ids)
+
+        return {'rice_field_id': rice_field_doc.id, 'prediction_count': len(prediction_ids), 'clusters': clusters}, 200
+
+
+class ReadinessModel(Resource):
+    def get(self):
+        """
+        Report whether the prediction path is loaded and warmed up, with the startup-time breakdown.
+        """
+        # Without warm-up on start the first prediction loads the services, so readiness does not wait for it
+        if current_app.config.get('WARM_UP_ON_START', True):
+            ready = all(service.warmed_up for service in prediction_services)
+        else:
+            ready = True
+        data = {
+            'ready': ready,
+            'services': {service.name: service.ready for service in [firestore_client, *prediction_services]},
+            'warmed_up': {service.name: service.warmed_up for service in prediction_services},
+            'startup': dict(startup_report),
+        }
+        if prediction_utils.ready and prediction_utils.prediction_cache:
+            data['prediction_cache'] = prediction_utils.prediction_cache.stats()
+        return data, 200 if ready else 503
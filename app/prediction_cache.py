@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from cachetools import TTLCache
+
+
+class PredictionCache:
+    def __init__(self, maxsize=1024, ttl=3600, cache_dir=None, disk_max_entries=10000, sweep_every=100):
+        """
+        Cache LCC predictions by image content so retried uploads skip segmentation and classification.
+
+        Args:
+            maxsize (int): Maximum number of predictions kept in memory.
+            ttl (float): Seconds a prediction stays valid in both tiers.
+            cache_dir (str): Directory for the optional on-disk tier, None keeps the cache in memory only.
+            disk_max_entries (int): Maximum number of predictions kept on disk, the oldest are removed first.
+            sweep_every (int): Number of disk writes between sweeps of expired and surplus files.
+        """
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.disk_max_entries = disk_max_entries
+        self.sweep_every = sweep_every
+        self.disk_writes = 0
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self.inference_seconds = 0.0
+        self.inferred_images = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._sweep_disk()
+
+    def key(self, image_data, model_version):
+        """
+        Build the cache key from the model version and the raw image bytes.
+        """
+        digest = hashlib.sha256(model_version.encode())
+        digest.update(image_data)
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _remove_disk(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            expires, value = entry['expires'], entry['value']
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            # Truncated or foreign file: treat it as a miss and drop it
+            self._remove_disk(path)
+            return None
+        if expires < time.time():
+            self._remove_disk(path)
+            return None
+        return value
+
+    def _sweep_disk(self):
+        """
+        Remove expired files and, past disk_max_entries, the oldest ones. Files are written once, so their
+        modification time plus the TTL is their expiry.
+        """
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        continue
+        except OSError:
+            return
+
+        expired_before = time.time() - self.ttl
+        live = []
+        for mtime, path in entries:
+            # Leftover temporary files of interrupted writes expire the same way
+            if mtime < expired_before:
+                self._remove_disk(path)
+            elif path.endswith('.json'):
+                live.append((mtime, path))
+
+        live.sort()
+        for _, path in live[:max(len(live) - self.disk_max_entries, 0)]:
+            self._remove_disk(path)
+
+    def _write_disk(self, key, value):
+        path = self._disk_path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'value': value, 'expires': time.time() + self.ttl}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._remove_disk(tmp_path)
+            return
+
+        with self.lock:
+            self.disk_writes += 1
+            sweep = self.disk_writes % self.sweep_every == 0
+        if sweep:
+            self._sweep_disk()
+
+    def get(self, key):
+        """
+        Return the cached {'class', 'confidence'} prediction for the key, or None.
+        """
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.counters['memory_hits'] += 1
+                return value
+
+        value = self._read_disk(key) if self.cache_dir else None
+        with self.lock:
+            if value is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['disk_hits'] += 1
+            self.memory[key] = value
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.memory[key] = value
+        if self.cache_dir:
+            self._write_disk(key, value)
+
+    def record_inference(self, seconds, image_count):
+        """
+        Record the time spent predicting images that missed the cache.
+        """
+        with self.lock:
+            self.inference_seconds += seconds
+            self.inferred_images += image_count
+
+    def stats(self):
+        """
+        Return hit/miss counters and the inference time the hits are estimated to have saved.
+        """
+        with self.lock:
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            seconds_per_image = self.inference_seconds / self.inferred_images if self.inferred_images else 0.0
+            return {
+                **self.counters,
+                'hits': hits,
+                'size': len(self.memory),
+                'estimated_seconds_saved': hits * seconds_per_image,
+            }
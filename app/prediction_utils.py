@@ -1,4 +1,6 @@
 import cv2
+import time
+import hashlib
 import torch
 import torch.nn as nn
 from torch.nn.functional import softmax
@@ -6,29 +8,76 @@ import torchvision
 from torchvision import transforms
 from PIL import Image
 from .leaf_segmentation import LeafSegmentation
+from .inference_scheduler import InferenceScheduler
+from .segmentation_executor import SegmentationExecutor
+from .yield_utils import LCC_THRESHOLDS
+
+
+def build_classification_model():
+    """
+    Build the DenseNet-121 classifier architecture without weights.
+    """
+    model = torchvision.models.densenet121(weights=None)
+    model.classifier = nn.Sequential(
+        nn.Dropout(0.5, inplace=True),
+        nn.Linear(1024, 16, bias=False),
+        nn.BatchNorm1d(16),
+        nn.ReLU(inplace=True),
+        nn.Linear(16, 4)
+    )
+    return model
+
+
+def build_data_transform():
+    """
+    Build the preprocessing applied to segmented images before classification.
+    """
+    return transforms.Compose([
+        transforms.Resize((100, 100)),
+        transforms.ToTensor(),
+        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+    ])
 
 
 class PredictionUtils:
-    def __init__(self):
-        # Initialize the leaf segmenter
-        self.segmenter = LeafSegmentation()
+    model_paths = {
+        'eager': './saved_model/GoogleNet_StateDict.pth',
+        'torchscript': './saved_model/GoogleNet_TorchScript.pt',
+        'onnx': './saved_model/GoogleNet.onnx',
+    }
+
+    def __init__(self, max_batch_size=16, batching_latency_ms=None, segmentation_workers=None,
+                 segmentation_working_size=None, prediction_cache=None, backend='eager', model_path=None):
+        # Initialize the leaf segmenter and its worker pool
+        self.segmenter = LeafSegmentation(segmentation_working_size)
+        self.segmentation_executor = SegmentationExecutor(self.segmenter, segmentation_workers)
 
         # Initialize the device (use GPU if available, otherwise use CPU)
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
-        # Load and define the classification model architecture
-        self.classification_model = self._load_model('./saved_model/GoogleNet_StateDict.pth')
-        self.data_transform = transforms.Compose([
-            transforms.Resize((100, 100)),
-            transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-        ])
+        # Load the classification model with the selected backend (eager, torchscript or onnx)
+        if backend not in self.model_paths:
+            raise ValueError(f'Unknown model backend: {backend}')
+        self.backend = backend
+        model_path = model_path or self.model_paths[backend]
+        self.classification_model = self._load_model(model_path)
+        self.model_version = self._get_model_version(model_path)
+        self.data_transform = build_data_transform()
+
+        # Share one model across concurrent requests through micro-batching (disabled without a latency deadline)
+        self.max_batch_size = max_batch_size
+        self.scheduler = None
+        if batching_latency_ms is not None:
+            self.scheduler = InferenceScheduler(self._forward, max_batch_size, batching_latency_ms)
+
+        # Cache predictions of previously seen images (optional)
+        self.prediction_cache = prediction_cache
 
         # Define configurations
         self.confidence_threshold = 0.7
         self.class_indices = {'swap1': 0, 'swap2': 1, 'swap3': 2, 'swap4': 3}
         self.level_map = {'swap1': 1, 'swap2': 2, 'swap3': 3, 'swap4': 4}
-        self.thresholds = {'Transplanted': 4, 'Direct Seeded': 3}
+        self.thresholds = LCC_THRESHOLDS
         self.age_to_growth_stage = {
             range(0, 4): 'Tillering',
             range(4, 8): 'Panicle Initiation',
@@ -41,47 +90,106 @@ class PredictionUtils:
             'Flowering': {'Dry': 20, 'Wet': 13},
             'Grain Filling': {'Dry': 15, 'Wet': 8}
         }
-        self.lcc_yield_baseline = {
-            'Transplanted': {1: 3.0, 2: 4.0, 3: 5.0, 4: 6.0},
-            'Direct Seeded': {1: 4.0, 2: 5.0, 3: 6.0, 4: 6.0}
-        }
 
     def _load_model(self, model_path):
         """
-        Load the model with predefined architecture.
+        Load the model for the selected backend.
         """
-        model = torchvision.models.densenet121(weights=None)
-        model.classifier = nn.Sequential(
-            nn.Dropout(0.5, inplace=True),
-            nn.Linear(1024, 16, bias=False),
-            nn.BatchNorm1d(16),
-            nn.ReLU(inplace=True),
-            nn.Linear(16, 4)
-        )
+        if self.backend == 'torchscript':
+            # The artifact is exported for the CPU (quantized kernels and the MKLDNN graph of optimize_for_inference)
+            self.device = torch.device('cpu')
+            return torch.jit.load(model_path, map_location=self.device).eval()
+
+        if self.backend == 'onnx':
+            try:
+                import onnxruntime
+            except ImportError:
+                raise ImportError('onnxruntime is required for the onnx model backend')
+            return onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+
+        model = build_classification_model()
         model.load_state_dict(torch.load(model_path, weights_only=True))
         return model.to(self.device).eval()
 
-    def _predict_LCC(self, image_file):
+    def _run_model(self, batch):
+        """
+        Return the logits of the loaded model for a batch of image tensors.
+        """
+        if self.backend == 'onnx':
+            input_name = self.classification_model.get_inputs()[0].name
+            return torch.from_numpy(self.classification_model.run(None, {input_name: batch.cpu().numpy()})[0])
+        return self.classification_model(batch)
+
+    def warm_up(self):
+        """
+        Start the segmentation workers and run one forward pass so the first request does not pay for it.
+        """
+        self.segmentation_executor.warm_up()
+        self._forward([torch.zeros(3, 100, 100)])
+
+    def _get_model_version(self, model_path):
+        """
+        Identify the model artifact and segmentation settings that predictions depend on.
+        """
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return f'{self.backend}:{digest.hexdigest()[:16]}:{self.segmenter.working_size}'
+
+    def _forward(self, tensors):
+        """
+        Run one forward pass over a list of image tensors and return (max_prob, predicted_idx) per tensor.
+        """
+        batch = torch.stack(tensors).to(self.device)
+        with torch.no_grad():
+            output = self._run_model(batch)
+            probabilities = softmax(output, dim=1)
+            max_prob, predicted_idx = torch.max(probabilities, 1)
+        return list(zip(max_prob.tolist(), predicted_idx.tolist()))
+
+    def _classify(self, images):
+        """
+        Classify segmented images in batches of at most max_batch_size.
+        """
+        tensors = [self.data_transform(Image.fromarray(image)) for image in images]
+        if self.scheduler:
+            return [future.result() for future in self.scheduler.submit(tensors)]
+
+        results = []
+        for start in range(0, len(tensors), self.max_batch_size):
+            results.extend(self._forward(tensors[start:start + self.max_batch_size]))
+        return results
+
+    def _predict_LCC(self, images_data):
         """
-        Predict the LCC reading for each image.
+        Predict the LCC reading for each encoded image.
         """
-        segmented_images = [self.segmenter.segment(file) for file in image_file]
+        predictions = [None] * len(images_data)
+
+        cache_keys = []
+        if self.prediction_cache:
+            cache_keys = [self.prediction_cache.key(data, self.model_version) for data in images_data]
+            predictions = [self.prediction_cache.get(key) for key in cache_keys]
+
+        missing = [i for i, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            start_time = time.perf_counter()
+            segmented_images = self.segmentation_executor.segment_all([images_data[i] for i in missing])
+            class_names = list(self.class_indices.keys())
+            for i, (max_prob, predicted_idx) in zip(missing, self._classify(segmented_images)):
+                predictions[i] = {'class': class_names[predicted_idx], 'confidence': max_prob}
+                if self.prediction_cache:
+                    self.prediction_cache.set(cache_keys[i], predictions[i])
+            if self.prediction_cache:
+                self.prediction_cache.record_inference(time.perf_counter() - start_time, len(missing))
 
         lcc_readings = []
-        for image in segmented_images:
-            image_pil = Image.fromarray(image)
-            image_tensor = self.data_transform(image_pil).unsqueeze(0).to(self.device)
-            with torch.no_grad():
-                output = self.classification_model(image_tensor)
-                probabilities = softmax(output, dim=1)
-                max_prob, predicted_idx = torch.max(probabilities, 1)
-
-            if max_prob.item() < self.confidence_threshold:
+        for prediction in predictions:
+            if prediction['confidence'] < self.confidence_threshold:
                 lcc_readings.append('Uncertain')
                 continue
-
-            class_name = list(self.class_indices.keys())[predicted_idx.item()]
-            lcc_readings.append(class_name)
+            lcc_readings.append(prediction['class'])
 
         return lcc_readings
 
@@ -123,11 +231,11 @@ class PredictionUtils:
         urea_required = total_nitrogen / fertilizer_content
         return urea_required
 
-    def predict_nutrition(self, image_paths, current_season, planting_type, paddy_age, field_area):
+    def predict_nutrition(self, images_data, current_season, planting_type, paddy_age, field_area):
         """
         Predict nutrition requirements.
         """
-        lcc_readings = self._predict_LCC(image_paths)
+        lcc_readings = self._predict_LCC(images_data)
 
         levels, nitrogen = self._calculate_nitrogen(current_season, planting_type, paddy_age, lcc_readings)
         if not levels or not nitrogen:
@@ -135,20 +243,3 @@ class PredictionUtils:
 
         urea_required = self._calculate_urea(nitrogen, field_area)
         return levels, urea_required
-
-    def predict_yield(self, field_area, lcc_levels, planting_type='Direct Seeded'):
-        optimal_nitrogen_level = self.thresholds.get(planting_type, 0)
-        valid_levels = [level for _, level in lcc_levels if level > 0]
-        average_level = round(sum(valid_levels) / len(valid_levels)) if valid_levels else optimal_nitrogen_level
-
-        planting_baseline = self.lcc_yield_baseline.get(planting_type, {})
-        max_yield_per_hectare = planting_baseline.get(average_level, 0)
-        max_yield = max_yield_per_hectare * field_area
-
-        yield_deduction = sum(
-            (max_yield_per_hectare - planting_baseline.get(level, 0)) * area
-            for area, level in lcc_levels
-            if level > 0 and level != average_level
-        )
-        current_yield = max_yield - yield_deduction
-        return current_yield
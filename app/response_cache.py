@@ -0,0 +1,128 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+from cachetools import LRUCache, TTLCache
+
+
+class _VersionCache(LRUCache):
+    """
+    LRU of user versions that remembers the highest version it has evicted.
+    """
+    floor = 0
+
+    def popitem(self):
+        user_id, version = super().popitem()
+        self.floor = max(self.floor, version)
+        return user_id, version
+
+
+class InMemoryResponseBackend:
+    """
+    Response backend kept in the memory of one process. Other processes do not see its invalidations, so its
+    TTL bounds how long they can serve a stale response.
+    """
+    def __init__(self, maxsize=1024, ttl=10, max_versions=65536):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Every invalidation takes a new, globally unique version. An user whose version was evicted falls back to
+        # the highest evicted version, which is never below the user's own last version and never equals the
+        # version of a stale entry, so an eviction can only cause cache misses.
+        self.versions = _VersionCache(maxsize=max_versions)
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+
+    def get_version(self, user_id):
+        with self.lock:
+            return self.versions.get(user_id, self.versions.floor)
+
+    def incr_version(self, user_id):
+        with self.lock:
+            self.counter += 1
+            self.versions[user_id] = self.counter
+
+
+class SQLiteResponseBackend:
+    """
+    Response backend backed by a SQLite file, shared by every worker process on the host.
+    """
+    def __init__(self, path, ttl=300):
+        self.path = path
+        self.ttl = ttl
+        with closing(self._connect()) as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS versions (user_id TEXT PRIMARY KEY, version INTEGER)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT value FROM responses WHERE key = ? AND expires > ?',
+                               (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM responses WHERE expires <= ?', (now,))
+            conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?)', (key, value, now + self.ttl))
+
+    def get_version(self, user_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT version FROM versions WHERE user_id = ?', (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def incr_version(self, user_id):
+        with closing(self._connect()) as conn:
+            conn.execute('INSERT INTO versions VALUES (?, 1) '
+                         'ON CONFLICT(user_id) DO UPDATE SET version = version + 1', (user_id,))
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        """
+        Cache of JSON responses per user, invalidated as a whole whenever one of the user's documents changes.
+
+        Entries are keyed by the user's current version, so invalidating only bumps the version and the
+        entries of older versions are never read again and expire on their own.
+
+        Args:
+            backend: InMemoryResponseBackend, SQLiteResponseBackend or any backend with the same methods.
+        """
+        self.backend = backend
+
+    def key(self, user_id, path):
+        """
+        Build the cache key of a request path. The key must be built before the response is computed, so a
+        change made meanwhile leaves the response under the outdated version.
+        """
+        return f'{user_id}:{self.backend.get_version(user_id)}:{path}'
+
+    def get(self, key):
+        """
+        Return the cached entry ({'etag', 'data', 'headers'}) of a key, or None.
+        """
+        value = self.backend.get(key)
+        return json.loads(value) if value else None
+
+    def set(self, key, data, headers=None):
+        """
+        Cache a response body with its headers and return the entry, including the ETag of the body.
+        """
+        body = json.dumps(data, sort_keys=True)
+        entry = {'etag': hashlib.sha1(body.encode()).hexdigest(), 'data': data, 'headers': dict(headers or {})}
+        self.backend.set(key, json.dumps(entry))
+        return entry
+
+    def invalidate(self, user_id):
+        self.backend.incr_version(user_id)
@@ -0,0 +1,41 @@
+import os
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SegmentationExecutor:
+    def __init__(self, segmenter, max_workers=None):
+        """
+        Run leaf segmentation for one or more requests on a shared thread pool.
+
+        OpenCV releases the GIL inside its kernels, so threads scale with the available cores
+        while the encoded image bytes are shared with the workers instead of being copied to other processes.
+
+        Args:
+            segmenter (LeafSegmentation): Segmenter used by every worker.
+            max_workers (int): Number of worker threads, defaults to the number of CPUs.
+        """
+        self.segmenter = segmenter
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='segmentation')
+
+    def _sample_image(self):
+        image = np.full((128, 128, 3), 255, np.uint8)
+        cv2.ellipse(image, (64, 64), (40, 20), 30, 0, 360, (40, 160, 40), thickness=cv2.FILLED)
+        return cv2.imencode('.png', image)[1].tobytes()
+
+    def warm_up(self):
+        """
+        Start every worker thread and run one segmentation on each, raising the error of a failed segmentation.
+        """
+        sample = self._sample_image()
+        futures = [self.pool.submit(self.segmenter.segment, sample) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def segment_all(self, images_data):
+        """
+        Segment the encoded images in parallel and return the results in input order.
+        """
+        return list(self.pool.map(self.segmenter.segment, images_data))
@@ -0,0 +1,69 @@
+import time
+import threading
+from importlib import import_module
+from contextlib import contextmanager
+
+# Seconds spent in each startup phase, filled in as phases and services complete
+startup_report = {}
+
+
+@contextmanager
+def timed(phase):
+    """
+    Record the duration of a startup phase in startup_report.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_report[phase] = time.perf_counter() - start
+
+
+class LazyService:
+    def __init__(self, name, module_name, class_name, config=dict):
+        """
+        Proxy that imports and builds a heavy service on first use, once, across threads.
+
+        Args:
+            name (str): Name used in the startup report.
+            module_name (str): Module (relative to the app package) that defines the service class.
+            class_name (str): Name of the service class.
+            config (callable): Returns the keyword arguments for the service constructor.
+        """
+        self.name = name
+        self.module_name = module_name
+        self.class_name = class_name
+        self.config = config
+        self._instance = None
+        self._lock = threading.Lock()
+        self.warmed_up = False
+
+    @property
+    def ready(self):
+        return self._instance is not None
+
+    def get(self):
+        """
+        Return the service instance, building it on the first call.
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    with timed(f'{self.name}.import'):
+                        service_class = getattr(import_module(self.module_name, __package__), self.class_name)
+                    with timed(f'{self.name}.init'):
+                        self._instance = service_class(**self.config())
+        return self._instance
+
+    def warm_up(self):
+        """
+        Build the service and run its own warm_up hook if it has one, then mark it as warmed up.
+        """
+        instance = self.get()
+        if hasattr(instance, 'warm_up'):
+            with timed(f'{self.name}.warm_up'):
+                instance.warm_up()
+        self.warmed_up = True
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
@@ -0,0 +1,42 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    Record the wall time of the stages of one request, including stages that overlap.
+    """
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, start, end=None):
+        """
+        Record a stage that ran from start until end (perf_counter values, end defaults to now).
+        """
+        end = time.perf_counter() if end is None else end
+        with self.lock:
+            self.stages[name] = {'start': start - self.start_time, 'duration': end - start}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def total(self):
+        return time.perf_counter() - self.start_time
+
+    def server_timing(self):
+        """
+        Format the stages as a Server-Timing header value (durations in milliseconds).
+        """
+        with self.lock:
+            stages = list(self.stages.items())
+        entries = [f'{name};dur={stage["duration"] * 1000:.1f}' for name, stage in stages]
+        entries.append(f'total;dur={self.total() * 1000:.1f}')
+        return ', '.join(entries)
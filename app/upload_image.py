@@ -1,6 +1,13 @@
 import os
+import time
+import logging
 import cloudinary
 import cloudinary.uploader
+from cloudinary.exceptions import Error as CloudinaryError, BadRequest, AuthorizationRequired, NotAllowed, NotFound, \
+    AlreadyExists
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 cloudinary.config(
@@ -10,17 +17,100 @@ cloudinary.config(
     secure=True
 )
 
+# Point uploads to another endpoint (e.g. a local fake Cloudinary server) when set
+if os.getenv('CLOUDINARY_UPLOAD_PREFIX'):
+    cloudinary.config(upload_prefix=os.getenv('CLOUDINARY_UPLOAD_PREFIX'))
 
-def upload_to_cloudinary(images):  # Upload an image
-    secure_urls = []
-    for image in images:
-        # Reset byte's pointer before upload
-        image.seek(0)
+# Shared by every request so the number of concurrent uploads per worker stays bounded
+upload_pool = ThreadPoolExecutor(max_workers=int(os.getenv('CLOUDINARY_UPLOAD_WORKERS', 4)),
+                                 thread_name_prefix='cloudinary-upload')
+
+
+# Rejected requests that fail the same way on every attempt (invalid image, credentials or permissions)
+_PERMANENT_ERRORS = (BadRequest, AuthorizationRequired, NotAllowed, NotFound, AlreadyExists)
+
+
+def _is_transient(error):
+    """
+    Tell whether a failed upload may succeed when retried: connection errors, timeouts, rate limits and 5xx.
 
+    cloudinary.uploader raises GeneralError for connection errors, timeouts and 500, RateLimited for 420 and a plain
+    Error for other unexpected status codes such as 502 and 503.
+    """
+    if isinstance(error, OSError):
+        return True
+    return isinstance(error, CloudinaryError) and not isinstance(error, _PERMANENT_ERRORS)
+
+
+def _upload_with_retry(image_data, retries, backoff, timeout, deadline, uploader):
+    for attempt in range(retries + 1):
         try:
-            upload_result = cloudinary.uploader.upload(image.read())
-            secure_urls.append(upload_result["secure_url"])
-        except Exception:
-            # Add emtpy string if failed to upload
+            return uploader(image_data, timeout=timeout)
+        except Exception as e:
+            delay = backoff * 2 ** attempt
+            if not _is_transient(e) or attempt == retries or time.monotonic() + delay >= deadline:
+                raise
+            time.sleep(delay)
+
+
+def submit_uploads(images_data, retries=2, backoff=0.5, timeout=20, total_timeout=60,
+                   uploader=cloudinary.uploader.upload):
+    """
+    Start uploading the images concurrently without waiting for them.
+
+    Args:
+        images_data (list): Encoded image bytes (or memoryviews), uploaded as-is without copying.
+        retries (int): Extra attempts per image after an upload failed with a transient error.
+        backoff (float): Seconds to wait before the first retry, doubled on every next retry.
+        timeout (float): Timeout in seconds of a single upload request.
+        total_timeout (float): Seconds to wait for all uploads before giving up on the remaining ones.
+        uploader (callable): Upload function with the signature of cloudinary.uploader.upload.
+
+    Returns:
+        tuple: The upload futures and their deadline, to be passed to collect_uploads or discard_uploads.
+    """
+    deadline = time.monotonic() + total_timeout
+    futures = [
+        upload_pool.submit(_upload_with_retry, image_data, retries, backoff, timeout, deadline, uploader)
+        for image_data in images_data
+    ]
+    return futures, deadline
+
+
+def collect_uploads(futures, deadline):
+    """
+    Wait for submitted uploads and return their secure URLs in input order ("" for failed uploads).
+    """
+    done = wait(futures, timeout=max(deadline - time.monotonic(), 0))[0]
+
+    secure_urls = []
+    for future in futures:
+        if future in done and future.exception() is None:
+            secure_urls.append(future.result()["secure_url"])
+        else:
+            # Add emtpy string if failed to upload; an upload that finishes after the deadline is deleted again
+            discard_uploads([future])
             secure_urls.append("")
     return secure_urls
+
+
+def _destroy_upload(public_id, destroyer):
+    try:
+        destroyer(public_id)
+    except Exception:
+        logger.warning('Failed to delete uploaded image %s', public_id, exc_info=True)
+
+
+def discard_uploads(futures, destroyer=cloudinary.uploader.destroy):
+    """
+    Cancel queued uploads and delete the images of uploads that already finished or finish later.
+
+    Used when the prediction the images belong to fails, so no orphaned images are left on Cloudinary.
+    """
+    def _on_done(future):
+        if not future.cancelled() and future.exception() is None:
+            upload_pool.submit(_destroy_upload, future.result()["public_id"], destroyer)
+
+    for future in futures:
+        future.cancel()
+        future.add_done_callback(_on_done)
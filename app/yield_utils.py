@@ -0,0 +1,31 @@
+# Optimal LCC level per planting type, below which a leaf needs nitrogen
+LCC_THRESHOLDS = {'Transplanted': 4, 'Direct Seeded': 3}
+
+# Maximum yield (ton per hectare) per planting type and LCC level
+LCC_YIELD_BASELINE = {
+    'Transplanted': {1: 3.0, 2: 4.0, 3: 5.0, 4: 6.0},
+    'Direct Seeded': {1: 4.0, 2: 5.0, 3: 6.0, 4: 6.0}
+}
+
+
+def predict_yield(field_area, lcc_levels, planting_type='Direct Seeded'):
+    """
+    Predict the yield of a rice field from the (area, level) pairs of its LCC clusters.
+
+    Plain arithmetic over the baseline tables, so routes can call it without loading the prediction models.
+    """
+    optimal_nitrogen_level = LCC_THRESHOLDS.get(planting_type, 0)
+    valid_levels = [level for _, level in lcc_levels if level > 0]
+    average_level = round(sum(valid_levels) / len(valid_levels)) if valid_levels else optimal_nitrogen_level
+
+    planting_baseline = LCC_YIELD_BASELINE.get(planting_type, {})
+    max_yield_per_hectare = planting_baseline.get(average_level, 0)
+    max_yield = max_yield_per_hectare * field_area
+
+    yield_deduction = sum(
+        (max_yield_per_hectare - planting_baseline.get(level, 0)) * area
+        for area, level in lcc_levels
+        if level > 0 and level != average_level
+    )
+    current_yield = max_yield - yield_deduction
+    return current_yield
@@ -0,0 +1,35 @@
+"""
+Build the statistic shards (users/{uid}/rice_field_stats/{rice_field_id}/shards) of every existing rice_field.
+
+The documents are kept up to date by add_prediction/delete_prediction, and dashboard reads never build them. Run
+this once after deploying on data written before they existed, otherwise those rice_fields show no summary until
+their next prediction. Running it again recomputes every document from the predictions.
+
+Usage: python -m scripts.backfill_rice_field_stats [--user <user_id>]
+"""
+import argparse
+import os
+from dotenv import load_dotenv
+from firebase_admin import credentials, initialize_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', help='Only backfill the rice_fields of this user')
+    args = parser.parse_args()
+
+    load_dotenv()
+    initialize_app(credentials.Certificate(os.getenv('FIREBASE_KEY')))
+
+    from app.firestore import FirestoreClient
+    client = FirestoreClient()
+
+    user_refs = [client.users_collection.document(args.user)] if args.user else client.users_collection.list_documents()
+    for user_ref in user_refs:
+        for rice_field_doc in user_ref.collection('rice_fields').select([]).stream():
+            statistic = client.rebuild_rice_field_stats(user_ref.id, rice_field_doc.reference)
+            print(f'{user_ref.id}/{rice_field_doc.id}: {len(statistic)} predictions')
+
+
+if __name__ == '__main__':
+    main()
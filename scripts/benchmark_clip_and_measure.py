@@ -0,0 +1,95 @@
+"""
+Compare the vectorized buffer/clip/measure path of GeospatialUtils with per-shape loops.
+
+Two loops are timed against GeospatialUtils._clip_and_measure on the same leaf points spread over a field, some of
+them on its edge so they are clipped:
+
+- baseline: the code before the geospatial changes. It buffers in degrees (5 m / 111320) and clips in
+  longitude/latitude, then projects every vertex to EPSG:3857 with its own Transformer.transform call. Its areas
+  are Web Mercator areas, so they are only reported (as the mean relative difference), not compared.
+- per-shape UTM: the current computation (metre buffer and clip in the field's UTM zone) done one shapely geometry
+  and one vertex at a time. The script checks that it gives the same areas as the vectorized path.
+
+Usage: python -m scripts.benchmark_clip_and_measure --sizes 100 500 1000 5000
+"""
+import argparse
+import random
+import time
+import numpy as np
+import shapely
+from pyproj import Transformer
+from shapely.geometry import Point, Polygon
+from app.geospatial_utils import GeospatialUtils
+
+FIELD = [[119.4200, -5.1400], [119.4300, -5.1400], [119.4300, -5.1300], [119.4200, -5.1300]]
+
+
+def _baseline_loop(geospatial_utils, shapes, boundary, transformer):
+    buffer_degrees = geospatial_utils.buffer_meters / 111320
+    exteriors, areas = [], []
+    for shape in shapes:
+        clipped = shape.buffer(buffer_degrees).intersection(boundary)
+        projected = Polygon([transformer.transform(x, y) for x, y in clipped.exterior.coords])
+        exteriors.append([[coord[1], coord[0]] for coord in clipped.exterior.coords])
+        areas.append(projected.area / 10_000)
+    return exteriors, np.array(areas)
+
+
+def _clip_and_measure_loop(geospatial_utils, shapes, field):
+    to_utm = geospatial_utils._get_transformer(geospatial_utils.geographic_crs, field.crs)
+    to_geographic = geospatial_utils._get_transformer(field.crs, geospatial_utils.geographic_crs)
+    exteriors, areas = [], []
+    for shape in shapes:
+        projected = Polygon([to_utm.transform(x, y) for x, y in shape.exterior.coords]) if shape.geom_type == 'Polygon' \
+            else Point(to_utm.transform(shape.x, shape.y))
+        clipped = projected.buffer(geospatial_utils.buffer_meters, quad_segs=16).intersection(field.projected)
+        exteriors.append([to_geographic.transform(x, y) for x, y in clipped.exterior.coords])
+        areas.append(clipped.area / 10_000)
+    return exteriors, np.array(areas)
+
+
+def _time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    geospatial_utils = GeospatialUtils(simplify_meters=0)
+    field = geospatial_utils._get_field_geometry(FIELD)
+    boundary = Polygon(FIELD)
+    web_mercator = Transformer.from_crs('EPSG:4326', 'EPSG:3857', always_xy=True)
+    rng = random.Random(0)
+    mismatched = False
+
+    for size in args.sizes:
+        coords = [[rng.uniform(119.4200, 119.4300), rng.uniform(-5.1400, -5.1300)] for _ in range(size)]
+        for coord in coords[::10]:
+            coord[0] = 119.4200  # on the western edge, so the buffer is clipped
+        shapes = shapely.points(np.array(coords))
+
+        baseline_time, (_, baseline_areas) = _time(
+            lambda: _baseline_loop(geospatial_utils, shapes, boundary, web_mercator), args.repeat)
+        loop_time, (_, loop_areas) = _time(lambda: _clip_and_measure_loop(geospatial_utils, shapes, field), args.repeat)
+        vector_time, (_, vector_areas) = _time(lambda: geospatial_utils._clip_and_measure(shapes, field), args.repeat)
+        same = np.allclose(loop_areas, vector_areas, rtol=1e-9)
+        mismatched |= not same
+        baseline_diff = np.mean(np.abs(baseline_areas - vector_areas) / vector_areas)
+        print(f'{size:>6} points  baseline: {1000 * baseline_time:9.1f} ms  per-shape UTM: {1000 * loop_time:9.1f} ms  '
+              f'vectorized: {1000 * vector_time:8.1f} ms  speed-up over baseline: {baseline_time / vector_time:5.1f}x  '
+              f'same areas as per-shape UTM: {same}  baseline area difference: {100 * baseline_diff:.2f}%')
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
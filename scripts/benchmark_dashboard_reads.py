@@ -0,0 +1,74 @@
+"""
+Measure GET /user dashboard reads against the Firestore emulator, with the reads run one after the other and with
+FirestoreClient.get_dashboard running the independent ones on its read pool.
+
+Only runs against the emulator (FIRESTORE_EMULATOR_HOST must be set, e.g. localhost:8080), where it seeds its own
+user, rice field and predictions.
+
+Usage: FIRESTORE_EMULATOR_HOST=localhost:8080 python -m scripts.benchmark_dashboard_reads --predictions 30
+"""
+import argparse
+import os
+import statistics
+import time
+from firebase_admin import initialize_app
+
+
+def _seed(client, predictions):
+    user_id = client.add_user('Benchmark', f'+62800{time.time_ns() % 10 ** 8}')
+    polygon = [[-7.8000, 110.3700], [-7.8000, 110.3720], [-7.8020, 110.3720], [-7.8020, 110.3700]]
+    client.add_rice_field(user_id, polygon, 4.0, 6.0)
+    rice_field_doc = client.get_latest_rice_field(user_id)
+
+    cluster = {'polygon': polygon, 'points': [[-7.8010, 110.3710]], 'level': 3}
+    for i in range(predictions):
+        data = {
+            'season': 'Wet', 'planting_type': 'Transplanted', 'paddy_age': 30 + i, 'urea_required': 40.0,
+            'yield': 6.0, 'rice_field': rice_field_doc.reference,
+        }
+        client.add_prediction(user_id, data, [cluster], ['https://example.com/leaf.jpg'])
+    return user_id
+
+
+def _sequential_dashboard(client, user_id):
+    user_data = client.get_user(user_id)
+    rice_field_doc = client.get_latest_rice_field(user_id)
+    result_dict = client.get_prediction_summary_by_rice_field(user_id, rice_field_doc)
+    user_data.update({'rice_field': result_dict['rice_field'], 'summary': result_dict['summary']})
+    return user_data
+
+
+def _measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(1000 * (time.perf_counter() - start))
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--predictions', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    if not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        raise SystemExit('Set FIRESTORE_EMULATOR_HOST to run against the Firestore emulator')
+    initialize_app(options={'projectId': os.getenv('GCLOUD_PROJECT', 'demo-petaniku')})
+
+    from app.firestore import FirestoreClient
+    client = FirestoreClient()
+    user_id = _seed(client, args.predictions)
+
+    if _sequential_dashboard(client, user_id) != client.get_dashboard(user_id):
+        raise SystemExit('Sequential and pooled dashboards differ')
+
+    for label, function in [('sequential', lambda: _sequential_dashboard(client, user_id)),
+                            ('read pool', lambda: client.get_dashboard(user_id))]:
+        median, worst = _measure(function, args.repeat)
+        print(f'{label:<12} median: {median:7.2f} ms  max: {worst:7.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare the stored size and read latency of rice_leaves coordinates as GeoPoint arrays and as encoded polylines.
+
+Synthetic clusters are buffered like GeospatialUtils does (in meters, in the field's UTM zone) and measured with and
+without simplification, so the vertex count, the Firestore value size and the decode time can be compared.
+
+Usage: python -m scripts.benchmark_geometry_codec --clusters 50 --simplify 0.1
+"""
+import argparse
+import random
+import time
+import shapely
+from pyproj import Transformer
+from google.cloud.firestore import GeoPoint
+from google.cloud.firestore_v1 import _helpers
+from app.geometry_codec import encode_polyline, decode_polyline
+
+
+def _make_polygons(count, buffer_meters, simplify_meters):
+    to_utm = Transformer.from_crs('EPSG:4326', 'EPSG:32748', always_xy=True)
+    to_geographic = Transformer.from_crs('EPSG:32748', 'EPSG:4326', always_xy=True)
+    polygons = []
+    for _ in range(count):
+        lon, lat = 119.4 + random.uniform(-0.01, 0.01), -5.1 + random.uniform(-0.01, 0.01)
+        lons = [lon + random.uniform(-1e-4, 1e-4) for _ in range(8)]
+        lats = [lat + random.uniform(-1e-4, 1e-4) for _ in range(8)]
+        projected = shapely.convex_hull(shapely.multipoints(list(zip(*to_utm.transform(lons, lats)))))
+        ring = shapely.get_exterior_ring(shapely.buffer(projected, buffer_meters, quad_segs=16))
+        if simplify_meters:
+            ring = shapely.simplify(ring, simplify_meters, preserve_topology=True)
+        lons, lats = to_geographic.transform(*shapely.get_coordinates(ring).T)
+        polygons.append([[float(y), float(x)] for x, y in zip(lons, lats)])
+    return polygons
+
+
+def _measure(label, polygons, encode, decode, repeat):
+    values = [_helpers.encode_value(encode(polygon)) for polygon in polygons]
+    size = sum(type(value).pb(value).ByteSize() for value in values)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            decode(_helpers.decode_value(value, None))
+    elapsed = (time.perf_counter() - start) / repeat
+
+    vertices = sum(len(polygon) for polygon in polygons)
+    print(f'{label:<24} vertices: {vertices:>6}  bytes: {size:>8}  decode: {1000 * elapsed:8.3f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--buffer', type=float, default=5, help='Buffer size in meters')
+    parser.add_argument('--simplify', type=float, default=0.1, help='Simplification tolerance in meters')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    geopoints = (lambda polygon: [GeoPoint(lat, lon) for lat, lon in polygon],
+                 lambda value: [[point.latitude, point.longitude] for point in value])
+    polyline = (encode_polyline, decode_polyline)
+
+    for simplify in (0, args.simplify):
+        polygons = _make_polygons(args.clusters, args.buffer, simplify)
+        suffix = f'simplify {simplify} m' if simplify else 'full'
+        _measure(f'geopoint, {suffix}', polygons, *geopoints, args.repeat)
+        _measure(f'polyline, {suffix}', polygons, *polyline, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
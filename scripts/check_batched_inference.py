@@ -0,0 +1,81 @@
+"""
+Check that classifying images in batches gives the same LCC predictions as classifying them one at a time.
+
+Every input is run through the loaded model alone and inside batches of --batch-size. The script reports the
+largest difference in logits and class probabilities, and any input whose predicted class or side of the
+confidence threshold (0.7) changes between the two runs. Segmented photos from --images are used when given,
+otherwise random inputs. Random inputs rarely land near the threshold, so real photos give the stronger check.
+
+Usage: python -m scripts.check_batched_inference --backend eager --images <leaf_photo_dir>
+"""
+import argparse
+from pathlib import Path
+import torch
+from torch.nn.functional import softmax
+from PIL import Image
+from app.prediction_utils import PredictionUtils
+from app.model_export import INPUT_SHAPE
+
+
+def _load_tensors(prediction_utils, images_dir, count):
+    if not images_dir:
+        generator = torch.Generator().manual_seed(0)
+        return [torch.randn(*INPUT_SHAPE, generator=generator) for _ in range(count)]
+
+    paths = sorted(p for p in Path(images_dir).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    tensors = [prediction_utils.data_transform(Image.fromarray(prediction_utils.segmenter.segment(path.read_bytes())))
+               for path in paths]
+    if not tensors:
+        raise SystemExit('No images found in images directory')
+    return tensors
+
+
+def _run(prediction_utils, tensors):
+    with torch.no_grad():
+        logits = prediction_utils._run_model(torch.stack(tensors).to(prediction_utils.device)).float().cpu()
+    return logits, softmax(logits, dim=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=list(PredictionUtils.model_paths), default='eager')
+    parser.add_argument('--model-path', help='Model artifact, the default path of the backend otherwise')
+    parser.add_argument('--images', help='Directory of leaf photos, random inputs are used otherwise')
+    parser.add_argument('--count', type=int, default=64, help='Number of random inputs when --images is not given')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--max-prob-diff', type=float, default=1e-5, help='Maximum absolute probability difference')
+    args = parser.parse_args()
+
+    prediction_utils = PredictionUtils(backend=args.backend, model_path=args.model_path)
+    threshold = prediction_utils.confidence_threshold
+    tensors = _load_tensors(prediction_utils, args.images, args.count)
+
+    single_logits, single_probs = map(torch.cat, zip(*(_run(prediction_utils, [tensor]) for tensor in tensors)))
+    batched_logits, batched_probs = map(torch.cat, zip(*(
+        _run(prediction_utils, tensors[i:i + args.batch_size]) for i in range(0, len(tensors), args.batch_size))))
+
+    max_logit_diff = (single_logits - batched_logits).abs().max().item()
+    max_prob_diff = (single_probs - batched_probs).abs().max().item()
+    single_max, single_idx = single_probs.max(dim=1)
+    batched_max, batched_idx = batched_probs.max(dim=1)
+
+    flips = 0
+    for i in range(len(tensors)):
+        class_flip = single_idx[i].item() != batched_idx[i].item()
+        threshold_flip = (single_max[i].item() < threshold) != (batched_max[i].item() < threshold)
+        if class_flip or threshold_flip:
+            flips += 1
+            print(f'input {i}: single {single_idx[i].item()} ({single_max[i].item():.6f}), '
+                  f'batched {batched_idx[i].item()} ({batched_max[i].item():.6f})')
+
+    near_threshold = ((single_max - threshold).abs() < 0.01).sum().item()
+    print(f'inputs: {len(tensors)}, batch size: {args.batch_size}, within 0.01 of the threshold: {near_threshold}')
+    print(f'max logit diff: {max_logit_diff:.3e}, max probability diff: {max_prob_diff:.3e}, '
+          f'class or threshold flips: {flips}')
+    if flips or max_prob_diff > args.max_prob_diff:
+        print('FAILED')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
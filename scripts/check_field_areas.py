@@ -0,0 +1,72 @@
+"""
+Check the hectares measured by GeospatialUtils against reference values for fixed fields and leaf points.
+
+- Square areas of 0.25, 1 and 4 ha at several latitudes and UTM zones, with the geodesic area from pyproj.Geod as
+  reference, measured without buffering.
+- A single leaf point inside, on the edge of and in the corner of a field. Its 5 m buffer (a 64-gon) covers
+  0.00784137 ha, and the field edge keeps exactly a half or about a quarter of it.
+
+Usage: python -m scripts.check_field_areas --tolerance 0.003
+"""
+import argparse
+import math
+import numpy as np
+from pyproj import Geod
+from shapely.geometry import Polygon
+from app.geospatial_utils import GeospatialUtils
+
+GEOD = Geod(ellps='WGS84')
+# Corner (longitude, latitude) of the fixed fields: Yogyakarta, Makassar, Phitsanulok, Brasilia, Paris
+FIELD_CORNERS = [(110.37, -7.80), (119.42, -5.14), (100.55, 16.43), (-47.93, -15.78), (2.35, 48.85)]
+SQUARE_SIDES_METERS = [50, 100, 200]
+# 5 m buffer with 16 segments per quarter circle
+BUFFER_HECTARES = 64 / 2 * 5 ** 2 * math.sin(2 * math.pi / 64) / 10_000
+
+
+def _square(lon, lat, side):
+    """Walk a geodesic square with the given side in meters, counter-clockwise from the south-west corner."""
+    corners = [(lon, lat)]
+    for azimuth in (90, 0, 270):
+        lon, lat, _ = GEOD.fwd(lon, lat, azimuth, side)
+        corners.append((lon, lat))
+    return corners
+
+
+def _check(label, measured, reference, tolerance):
+    error = abs(measured - reference) / reference
+    print(f'{label:<48} measured: {measured:.6f} ha  reference: {reference:.6f} ha  error: {100 * error:.3f}%')
+    return error <= tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tolerance', type=float, default=0.003, help='Maximum relative error')
+    args = parser.parse_args()
+
+    unbuffered = GeospatialUtils(buffer_meters=0)
+    geospatial_utils = GeospatialUtils()
+    failures = 0
+
+    for lon, lat in FIELD_CORNERS:
+        for side in SQUARE_SIDES_METERS:
+            corners = _square(lon, lat, side)
+            field = unbuffered._get_field_geometry(_square(lon, lat, side * 2))
+            measured = unbuffered._clip_and_measure(np.array([Polygon(corners)], dtype=object), field)[1][0]
+            reference = abs(GEOD.polygon_area_perimeter(*zip(*corners))[0]) / 10_000
+            failures += not _check(f'{side} m square at {lon}, {lat}', measured, reference, args.tolerance)
+
+        boundary = _square(lon, lat, 100)
+        centre = GEOD.fwd(*GEOD.fwd(lon, lat, 90, 50)[:2], 0, 50)[:2]
+        edge = GEOD.fwd(lon, lat, 90, 50)[:2]
+        for label, point, fraction in [('inside', centre, 1), ('edge', edge, 0.5), ('corner', (lon, lat), 0.25)]:
+            result = geospatial_utils.cluster_points([[point[0], point[1], 2]], boundary)
+            failures += not _check(f'leaf point on the {label} at {lon}, {lat}', result[0]['area'],
+                                   BUFFER_HECTARES * fraction, args.tolerance)
+
+    print(f'failures: {failures}')
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Check the projected and incremental clustering modes of GeospatialUtils on dense scans, and time them.
+
+- incremental: points appended to a FieldHistory one prediction at a time must get exactly the labels of a single
+  DBSCAN run (euclidean eps in meters, min_samples=2, KD-tree) over all of them in the field's UTM zone.
+- projected: DBSCAN on UTM coordinates is compared with the haversine DBSCAN on the same points. Distances differ
+  slightly (UTM scale factor), so pairs very close to eps may end up differently; whether the labels are identical
+  and their adjusted Rand index are only reported.
+
+Usage: python -m scripts.check_field_history --sizes 200 1000 5000 --batch-size 10
+"""
+import argparse
+import random
+import time
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics import adjusted_rand_score
+from app.field_history import FieldHistory
+from app.geospatial_utils import GeospatialUtils
+
+FIELD = [[119.4200, -5.1400], [119.4300, -5.1400], [119.4300, -5.1300], [119.4200, -5.1300]]
+
+
+def _walks(size, rng):
+    """Points of repeated walks over the field: a few hundred sampling spots revisited with GPS noise."""
+    spots = [(rng.uniform(119.4205, 119.4295), rng.uniform(-5.1395, -5.1305)) for _ in range(max(size // 5, 1))]
+    points = []
+    for _ in range(size):
+        lon, lat = rng.choice(spots)
+        points.append([lon + rng.gauss(0, 3e-5), lat + rng.gauss(0, 3e-5), rng.randint(0, 4)])
+    return np.array(points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 5000])
+    parser.add_argument('--batch-size', type=int, default=10, help='Points per appended prediction')
+    args = parser.parse_args()
+
+    haversine = GeospatialUtils(cluster_mode='haversine')
+    projected = GeospatialUtils(cluster_mode='projected')
+    field = projected._get_field_geometry(FIELD)
+    rng = random.Random(0)
+    mismatched = False
+
+    for size in args.sizes:
+        points = _walks(size, rng)
+        coords = projected._project_coords(points[:, :2], field.crs)
+
+        start = time.perf_counter()
+        expected = DBSCAN(eps=projected.epsilon_meters, min_samples=2, metric='euclidean', algorithm='kd_tree').fit(
+            coords).labels_
+        full_time = time.perf_counter() - start
+
+        history, append_times = FieldHistory(), []
+        for i in range(0, size, args.batch_size):
+            start = time.perf_counter()
+            labels = history.extend(coords[i:i + args.batch_size], points[i:i + args.batch_size],
+                                    projected.epsilon_meters)
+            append_times.append(time.perf_counter() - start)
+        same = np.array_equal(labels, expected)
+        mismatched |= not same
+
+        start = time.perf_counter()
+        haversine_labels = haversine._dbscan_points(points, field)
+        haversine_time = time.perf_counter() - start
+        start = time.perf_counter()
+        projected_labels = projected._dbscan_points(points, field)
+        projected_time = time.perf_counter() - start
+        identical = np.array_equal(haversine_labels, projected_labels)
+        rand_index = adjusted_rand_score(haversine_labels, projected_labels)
+
+        print(f'{size:>6} points  haversine: {1000 * haversine_time:8.1f} ms  projected: {1000 * projected_time:8.1f} ms  '
+              f'identical: {identical} (ARI {rand_index:.4f})  full re-cluster: {1000 * full_time:8.1f} ms  '
+              f'last append: {1000 * append_times[-1]:6.1f} ms  incremental same as DBSCAN: {same}')
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
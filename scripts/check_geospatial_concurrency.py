@@ -0,0 +1,57 @@
+"""
+Run GeospatialUtils.cluster_points from many threads on one shared instance and compare every result with a
+single-threaded run of the same input.
+
+Fields are spread over several UTM zones and both hemispheres, so concurrent calls use different per-thread
+transformers and cached field boundaries at the same time.
+
+Usage: python -m scripts.check_geospatial_concurrency --threads 16 --rounds 20
+"""
+import argparse
+import random
+from concurrent.futures import ThreadPoolExecutor
+from app.geospatial_utils import GeospatialUtils
+
+# Field centres (longitude, latitude) in different UTM zones, north and south of the equator
+FIELD_CENTRES = [(110.37, -7.80), (119.42, -5.14), (100.55, 16.43), (106.83, 10.82), (-47.93, -15.78), (2.35, 48.85)]
+
+
+def _make_case(case_id, centre):
+    rng = random.Random(case_id)
+    lon, lat = centre
+    half = 0.002  # about 200 m
+    boundary = [[lon - half, lat - half], [lon + half, lat - half], [lon + half, lat + half], [lon - half, lat + half]]
+    points = [[lon + rng.uniform(-half, half) * 0.8, lat + rng.uniform(-half, half) * 0.8, rng.randint(0, 4)]
+              for _ in range(10)]
+    # A few close pairs so every case has clusters as well as noise
+    points += [[x + 2e-5, y + 2e-5, level] for x, y, level in points[:3]]
+    return points, boundary, (f'user-{case_id % 3}', f'field-{case_id}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20, help='Number of times every case is run concurrently')
+    args = parser.parse_args()
+
+    cases = [_make_case(i, centre) for i, centre in enumerate(FIELD_CENTRES * 2)]
+    expected = [GeospatialUtils().cluster_points(points, boundary) for points, boundary, _ in cases]
+
+    geospatial_utils = GeospatialUtils()
+    jobs = [i for _ in range(args.rounds) for i in range(len(cases))]
+    random.Random(0).shuffle(jobs)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(lambda i: (i, geospatial_utils.cluster_points(*cases[i])), jobs))
+
+    mismatches = 0
+    for i, result in results:
+        if result != expected[i]:
+            mismatches += 1
+            print(f'case {i} ({FIELD_CENTRES[i % len(FIELD_CENTRES)]}): result differs from the single-threaded run')
+    print(f'calls: {len(results)}, threads: {args.threads}, mismatches: {mismatches}')
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
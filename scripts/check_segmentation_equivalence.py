@@ -0,0 +1,99 @@
+"""
+Check that the fused segmentation masks give pixel-identical output to the former per-channel path, and time both.
+
+The per-channel path copies the image for every colour-difference channel, masks the copy, converts it to
+grayscale and refines it separately, then ANDs the three refined images (as LeafSegmentation did before the
+channels were fused). Leaf photos from --images are used when given, otherwise a synthetic 12 MP leaf photo.
+
+Usage: python -m scripts.check_segmentation_equivalence --images <leaf_photo_dir>
+"""
+import argparse
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from app.leaf_segmentation import LeafSegmentation
+
+
+class PerChannelSegmentation(LeafSegmentation):
+    def _refine_segmentation(self, img):
+        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        brightened_img = cv2.convertScaleAbs(gray_img, alpha=self.brightness_alpha, beta=self.brightness_beta)
+        binary_mask = cv2.threshold(brightened_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        contours = cv2.findContours(binary_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+        largest_contour = max(contours, key=cv2.contourArea)
+        refined_mask = np.zeros_like(binary_mask)
+        cv2.drawContours(refined_mask, [largest_contour], -1, 255, thickness=cv2.FILLED)
+        return cv2.bitwise_and(img, img, mask=refined_mask)
+
+    def _process_channel(self, img_copy, channel):
+        mask = self._create_channel_mask(channel)
+        img_copy[mask == 0] = 0
+        return self._refine_segmentation(img_copy)
+
+    def segment(self, image_data):
+        image_rgb = self._decode(image_data)
+        blue, green, red = cv2.split(image_rgb)
+        channels = [
+            cv2.subtract(green, red),
+            cv2.subtract(green, blue),
+            cv2.divide(green, red),
+        ]
+
+        combined_result = self._process_channel(np.copy(image_rgb), channels[0])
+        for channel in channels[1:]:
+            refined_result = self._process_channel(np.copy(image_rgb), channel)
+            combined_result = cv2.bitwise_and(combined_result, refined_result)
+        return self._fill_background(combined_result, 255)
+
+
+def _synthetic_leaf(width=4000, height=3000):
+    rng = np.random.default_rng(0)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (90, 120, 150)  # soil-coloured background (BGR)
+    cv2.ellipse(image, (width // 2, height // 2), (width // 3, height // 8), 20, 0, 360, (40, 170, 70), -1)
+    noise = rng.integers(-20, 21, image.shape, dtype=np.int16)
+    image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def _time(segmenter, image_data, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = segmenter.segment(image_data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of leaf photos, a synthetic 12 MP photo is used otherwise')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.images:
+        paths = sorted(p for p in Path(args.images).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+        samples = [(str(path), path.read_bytes()) for path in paths]
+        if not samples:
+            raise SystemExit('No images found in images directory')
+    else:
+        samples = [('synthetic 4000x3000', _synthetic_leaf())]
+
+    fused, per_channel = LeafSegmentation(), PerChannelSegmentation()
+    different = 0
+    for name, image_data in samples:
+        per_channel_time, expected = _time(per_channel, image_data, args.repeat)
+        fused_time, actual = _time(fused, image_data, args.repeat)
+        identical = np.array_equal(expected, actual)
+        different += not identical
+        print(f'{name}: per-channel {1000 * per_channel_time:.1f} ms, fused {1000 * fused_time:.1f} ms, '
+              f'identical: {identical}')
+
+    print(f'images: {len(samples)}, different outputs: {different}')
+    if different:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare LCC predictions at full resolution and at a reduced segmentation working size.
+
+The dataset directory must contain one sub-directory per class (swap1, swap2, swap3, swap4) with the leaf photos.
+
+Usage: python -m scripts.check_working_size <dataset_dir> --working-size 1024
+"""
+import argparse
+from pathlib import Path
+from app.prediction_utils import PredictionUtils
+
+
+def _load_dataset(dataset_dir, class_names):
+    samples = []
+    for class_name in class_names:
+        for path in sorted((Path(dataset_dir) / class_name).glob('*')):
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png'):
+                samples.append((path, class_name))
+    return samples
+
+
+def _predict(prediction_utils, samples, working_size):
+    prediction_utils.segmenter.working_size = working_size
+    return prediction_utils._predict_LCC([path.read_bytes() for path, _ in samples])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset_dir')
+    parser.add_argument('--working-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    prediction_utils = PredictionUtils()
+    samples = _load_dataset(args.dataset_dir, prediction_utils.class_indices.keys())
+    if not samples:
+        raise SystemExit('No images found in dataset directory')
+
+    full_readings = _predict(prediction_utils, samples, None)
+    reduced_readings = _predict(prediction_utils, samples, args.working_size)
+
+    changed = 0
+    for (path, _), full, reduced in zip(samples, full_readings, reduced_readings):
+        if full != reduced:
+            changed += 1
+            print(f'{path}: {full} -> {reduced}')
+
+    labels = [label for _, label in samples]
+    full_accuracy = sum(r == l for r, l in zip(full_readings, labels)) / len(samples)
+    reduced_accuracy = sum(r == l for r, l in zip(reduced_readings, labels)) / len(samples)
+    print(f'images: {len(samples)}, changed predictions: {changed}')
+    print(f'accuracy full resolution: {full_accuracy:.4f}, working size {args.working_size}: {reduced_accuracy:.4f}')
+    if changed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Export the LCC classifier to TorchScript and/or ONNX and compare the artifacts against the eager model.
+
+Parity and latency are measured on segmented photos from --images when given, otherwise on random inputs.
+The same photos are used to calibrate static ONNX quantization.
+The script exits with status 1 when an artifact exceeds the logit difference or top-1 agreement thresholds.
+
+Usage: python -m scripts.export_model --backend all --quantize dynamic --images <leaf_photo_dir>
+"""
+import argparse
+from pathlib import Path
+import torch
+from PIL import Image
+from app.leaf_segmentation import LeafSegmentation
+from app.prediction_utils import PredictionUtils, build_data_transform
+from app.model_export import INPUT_SHAPE, load_eager_model, fuse_batchnorm, export_torchscript, export_onnx, \
+    load_runner, compare
+
+
+def _load_batches(images_dir, batch_size, batch_count):
+    if not images_dir:
+        return [torch.randn(batch_size, *INPUT_SHAPE) for _ in range(batch_count)]
+
+    segmenter = LeafSegmentation()
+    data_transform = build_data_transform()
+    paths = sorted(p for p in Path(images_dir).rglob('*') if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    tensors = [data_transform(Image.fromarray(segmenter.segment(path.read_bytes()))) for path in paths]
+    if not tensors:
+        raise SystemExit('No images found in images directory')
+    return [torch.stack(tensors[i:i + batch_size]) for i in range(0, len(tensors), batch_size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', default=PredictionUtils.model_paths['eager'])
+    parser.add_argument('--backend', choices=['torchscript', 'onnx', 'all'], default='all')
+    parser.add_argument('--quantize', choices=['none', 'dynamic', 'static'], default='none')
+    parser.add_argument('--no-fuse', action='store_true', help='Keep BatchNorm layers unfused')
+    parser.add_argument('--images', help='Directory of leaf photos used for parity checks and calibration')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--batches', type=int, default=5, help='Number of random batches when --images is not given')
+    parser.add_argument('--max-abs-diff', type=float,
+                        help='Maximum absolute logit difference (default 1e-3, or 0.25 with quantization)')
+    parser.add_argument('--min-top1-agreement', type=float,
+                        help='Minimum ratio of equal top-1 predictions (default 1.0, or 0.98 with quantization)')
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    reference = load_eager_model(args.weights)
+    model = reference if args.no_fuse else fuse_batchnorm(reference)
+    batches = _load_batches(args.images, args.batch_size, args.batches)
+    quantize = None if args.quantize == 'none' else args.quantize
+    max_abs_diff = args.max_abs_diff if args.max_abs_diff is not None else (0.25 if quantize else 1e-3)
+    min_top1_agreement = args.min_top1_agreement if args.min_top1_agreement is not None else (0.98 if quantize else 1.0)
+
+    artifacts = []
+    if args.backend in ('torchscript', 'all'):
+        if quantize == 'static':
+            raise SystemExit('Static quantization is only supported for the onnx backend')
+        path = export_torchscript(model, PredictionUtils.model_paths['torchscript'], quantize=bool(quantize))
+        artifacts.append(('torchscript', path))
+    if args.backend in ('onnx', 'all'):
+        path = export_onnx(model, PredictionUtils.model_paths['onnx'], quantize, calibration_batches=batches)
+        artifacts.append(('onnx', path))
+
+    failed = False
+    for backend, path in artifacts:
+        print(f'{backend}: {path}')
+        result = compare(reference, load_runner(backend, path), batches)
+        for key, value in result.items():
+            print(f'  {key}: {value:.6f}')
+        if result['max_abs_diff'] > max_abs_diff or result['top1_agreement'] < min_top1_agreement:
+            failed = True
+            print(f'  FAILED: max_abs_diff must be <= {max_abs_diff}, top1_agreement >= {min_top1_agreement}')
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Measure the peak Python memory of reading the images of a prediction request, before and after the ingestion layer.
+
+The baseline parses the upload with Flask's default request class and reads every file into bytes; the ingestion
+layer streams each file into its own buffer and shares it as a memoryview. Synthetic JPEG-signed payloads are used,
+so the measurement covers parsing and reading only, not decoding.
+
+Usage: python -m scripts.measure_ingestion_memory --images 10 --size-mb 4
+"""
+import argparse
+import os
+import tracemalloc
+from io import BytesIO
+from flask import Flask, Request, request
+from app.ingestion import IngestionRequest, read_images
+
+
+def _peak_bytes(request_class, read, images, size):
+    app = Flask(__name__)
+    app.request_class = request_class
+    app.config['MAX_IMAGE_BYTES'] = size + 1
+
+    payload = b'\xff\xd8\xff' + os.urandom(size - 3)
+    data = {'images': [(BytesIO(payload), f'{i}.jpg') for i in range(images)]}
+    with app.test_request_context('/', method='POST', data=data, content_type='multipart/form-data'):
+        tracemalloc.start()
+        images_data = read(request.files.getlist('images'))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert len(images_data) == images
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=10)
+    parser.add_argument('--size-mb', type=float, default=4)
+    args = parser.parse_args()
+    size = int(args.size_mb * 1024 * 1024)
+
+    baseline = _peak_bytes(Request, lambda files: [file.read() for file in files], args.images, size)
+    ingestion = _peak_bytes(IngestionRequest, read_images, args.images, size)
+    print(f'default request, read():   {baseline / 2 ** 20:8.1f} MiB peak')
+    print(f'ingestion, memoryviews:    {ingestion / 2 ** 20:8.1f} MiB peak')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Create the phones lookup documents (phones/{phone_key} -> user_id) of every existing, non-deleted user.
+
+Login and registration only read the phones collection, so this must run before deploying the phone index.
+Running it again is safe: phone numbers that are already indexed are left untouched. Phone numbers shared by
+several users are reported; only the first user keeps the number.
+
+Usage: python -m scripts.migrate_phone_index
+"""
+import os
+from dotenv import load_dotenv
+from firebase_admin import credentials, initialize_app
+
+
+def main():
+    load_dotenv()
+    initialize_app(credentials.Certificate(os.getenv('FIREBASE_KEY')))
+
+    from app.firestore import FirestoreClient
+    client = FirestoreClient()
+
+    indexed, conflicts = 0, 0
+    for user_doc in client.users_collection.where('is_deleted', '==', False).select(['phone']).stream():
+        owner_id = client.index_user_phone(user_doc.id, user_doc.get('phone'))
+        if owner_id == user_doc.id:
+            indexed += 1
+        else:
+            conflicts += 1
+            print(f'{user_doc.id}: phone already registered by {owner_id}')
+    print(f'{indexed} users indexed, {conflicts} conflicts')
+
+
+if __name__ == '__main__':
+    main()